@@ -2,39 +2,549 @@
 
 """Word Finder: finds random words from a dictionary."""
 
+from array import array
+from collections.abc import Sequence
+from contextlib import nullcontext
+from heapq import nlargest
+from itertools import accumulate
+from math import expm1, floor, log
+from mmap import ACCESS_READ, mmap
+import gzip
+import json
+import os
 import random
+import sys
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def load_array(filename, typecode, stat):
+    """Loads an array saved by save_array, if it's up to date with the
+    file it was made from (as described by its stat)."""
+
+    header = array('Q')
+    try:
+        with open(filename, 'rb') as file:
+            header.fromfile(file, 2)
+            if list(header) != [stat.st_size, stat.st_mtime_ns]:
+                return None
+
+            values = array(typecode)
+            values.frombytes(file.read())
+            return values
+    except (OSError, EOFError, ValueError):
+        return None
+
+def save_array(filename, values, stat):
+    """Saves an array made from a file (described by its stat) after a header
+    of the file's size & modification time; if it can't be written, it's
+    silently left unsaved."""
+
+    temp_name = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temp_name, 'wb') as file:
+            array('Q', [stat.st_size, stat.st_mtime_ns]).tofile(file)
+            values.tofile(file)
+        os.replace(temp_name, filename)
+    except OSError:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+
+def load_categories(filename, stat):
+    """Loads category ranges saved by save_categories, if they're up to date
+    with the file they were parsed from (as described by its stat)."""
+
+    try:
+        with open(filename, 'r') as file:
+            saved = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    if saved.get("size") != stat.st_size or saved.get("mtime_ns") != stat.st_mtime_ns:
+        return None
+
+    return {
+        name: [tuple(r) for r in ranges]
+        for name, ranges in saved["categories"].items()
+    }
+
+def save_categories(filename, categories, stat):
+    """Saves category ranges parsed from a file (described by its stat), along
+    with the file's size & modification time; if they can't be written,
+    they're silently left unsaved."""
+
+    temp_name = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temp_name, 'w') as file:
+            json.dump({
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "categories": categories
+            }, file)
+        os.replace(temp_name, filename)
+    except OSError:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+
+class CategoryRanges:
+    """Collects the contiguous ranges of word positions under each category
+    header of a dictionary file, as it's read.
+
+    >>> ranges = CategoryRanges()
+    >>> ranges.header("fruits", 0)
+    >>> ranges.header("vegetables", 2)
+    >>> ranges.end(5)
+    {'fruits': [(0, 2)], 'vegetables': [(2, 5)]}
+    """
+
+    def __init__(self):
+        """Starts with no categories, before any header."""
+
+        self.ranges = {}
+        self.name = None
+        self.start = 0
+
+    def header(self, name, position):
+        """Starts a new category at a word position; words after an empty
+        header are left uncategorized."""
+
+        self.end(position)
+        self.name = name or None
+        self.start = position
+
+    def end(self, position):
+        """Ends the current category at a word position & returns the
+        ranges of each category, as lists of (start, end) pairs."""
+
+        if self.name is not None and position > self.start:
+            self.ranges.setdefault(self.name, []).append((self.start, position))
+        self.name = None
+
+        return self.ranges
+
+def open_source(source):
+    """Opens a source of lines for reading: a filename (gzip-compressed if
+    it ends in .gz), "-" for standard input, or an already open file."""
+
+    if not isinstance(source, str):
+        return nullcontext(source)
+    elif source == "-":
+        return nullcontext(sys.stdin)
+    elif source.endswith(".gz"):
+        return gzip.open(source, 'rt')
+
+    return open(source, 'r')
+
+def reservoir_sample(items, k):
+    """Samples k items uniformly from an iterable of unknown length in one
+    pass, holding only k items at a time.
+
+    Uses Li's "Algorithm L", which draws how many items to skip between
+    replacements rather than a random number for every item.
+
+    Returns
+    -------
+    (list, int)
+        The sample (all of the items, if there are k or fewer) & the number
+        of items seen.
+    """
+
+    def unit():
+        # uniform on (0, 1), so its logarithm is finite
+        return random.random() or sys.float_info.min
+
+    sample = []
+    count = 0
+    if k <= 0:
+        for count, _ in enumerate(items, 1):
+            pass
+        return sample, count
+
+    # log of the largest of k uniform keys; the next item to replace one at
+    log_w = log(unit()) / k
+    next_i = k + floor(log(unit()) / log(-expm1(log_w)))
+
+    for i, item in enumerate(items):
+        if i < k:
+            sample.append(item)
+        elif i == next_i:
+            sample[random.randrange(k)] = item
+            log_w += log(unit()) / k
+            next_i += floor(log(unit()) / log(-expm1(log_w))) + 1
+        count = i + 1
+
+    return sample, count
+
+class LineIndex(Sequence):
+    """Read-only sequence of the words in a file, found through the byte
+    offset of each word's line instead of being held in memory.
+
+    The offsets are an array('Q') saved next to the file (after a header of
+    the file's size & modification time, so a changed file is re-indexed),
+    and words are read from a memory-mapped view of the file; memory use is
+    8 bytes per word, plus 8 more for the word's weight if weighted.
+
+    >>> index = LineIndex("shortwords.txt", ".idx", lambda line: True)
+    >>> len(index), index[0], index[-1]
+    (3, 'apple', 'banana')
+    """
+
+    def __init__(self, filename, suffix, is_word, split=None, category=None):
+        """Loads (or builds & saves) the index of a file's words.
+
+        is_word is called with each line of the file to decide whether
+        it holds a word; suffix is appended to filename to name the index.
+        If given, split divides a line into its word & its weight, and the
+        weights are kept in the weights array. If given, category returns
+        the name of the category a header line starts (or None for other
+        lines), and the ranges of indices of each category are kept in the
+        categories dictionary.
+        """
+
+        stat = os.stat(filename)
+        index_name = filename + suffix
+        self.split = split
+
+        self.offsets = load_array(index_name, 'Q', stat)
+        self.weights = load_array(index_name + ".weights", 'd', stat) if split else None
+        self.categories = load_categories(index_name + ".categories", stat) if category else {}
+
+        if (
+            self.offsets is None or
+            (split is not None and self.weights is None) or
+            (category is not None and self.categories is None)
+        ):
+            self.offsets, self.weights, self.categories = self.build(
+                filename, is_word, split, category
+            )
+            save_array(index_name, self.offsets, stat)
+            if split is not None:
+                save_array(index_name + ".weights", self.weights, stat)
+            if category is not None:
+                save_categories(index_name + ".categories", self.categories, stat)
+
+        self.map = None
+        if stat.st_size > 0:
+            with open(filename, 'rb') as file:
+                self.map = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+    def build(self, filename, is_word, split, category):
+        """Finds the offset (& weight, if split is given) of every line of
+        a file holding a word, & the ranges of each category if category
+        is given."""
+
+        offsets = array('Q')
+        weights = array('d') if split is not None else None
+        categories = CategoryRanges()
+        offset = 0
+
+        with open(filename, 'rb') as file:
+            for line in file:
+                line_text = line.decode()
+                name = category(line_text) if category is not None else None
+                if name is not None:
+                    categories.header(name, len(offsets))
+                elif is_word(line_text):
+                    offsets.append(offset)
+                    if split is not None:
+                        weights.append(split(line_text)[1])
+                offset += len(line)
+
+        return offsets, weights, categories.end(len(offsets))
+
+    def __len__(self):
+        """Number of words in the file."""
+
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        """Reads the ith word from the file."""
+
+        start = self.offsets[i]
+        end = self.map.find(b"\n", start)
+        if end < 0:
+            end = len(self.map)
+
+        line = self.map[start:end].decode()
+        return line.strip() if self.split is None else self.split(line)[0]
 
 class WordFinder:
     """Class for obtaining random words from a dictionary.
-    
+
     >>> wf = WordFinder("shortwords.txt")
     3 words read
 
     >>> wf.random() in {"apple", "orange", "banana"}
+    True
 
     >>> wf.random() in {"apple", "orange", "banana"}
     True
 
     >>> wf.random() in {"apple", "orange", "banana"}
     True
+
+    For very large dictionaries, words can be read from the file on demand
+    through an index of their offsets rather than all being held in memory:
+
+    >>> wf = WordFinder("shortwords.txt", indexed=True)
+    3 words read
+
+    >>> wf.random() in {"apple", "orange", "banana"}
+    True
+
+    Many words can be drawn at once, with or without replacement:
+
+    >>> len(wf.choices(1000))
+    1000
+
+    >>> sorted(wf.sample(3))
+    ['apple', 'banana', 'orange']
+
+    Weighted dictionaries have a frequency after each word; words are drawn
+    in proportion to their frequency:
+
+    >>> wf = WordFinder("frequencies.txt", weighted=True)
+    3 words read
+
+    >>> sorted(set(wf.choices(1000)))
+    ['apple', 'orange']
+
+    >>> wf.sample(3)
+    Traceback (most recent call last):
+      ...
+    ValueError: sample larger than the number of words with a nonzero weight
+
+    Sources that are too big to hold or can't be indexed, like piped input,
+    can be reservoir-sampled in a single pass instead; random words are then
+    drawn from the sample:
+
+    >>> import io
+    >>> wf = WordFinder(io.StringIO("apple\\norange\\nbanana\\n"), sample=2)
+    3 words read
+
+    >>> len(wf.words), wf.random() in {"apple", "orange", "banana"}
+    (2, True)
     """
 
-    def __init__(self, filename):
-        """Reads a dictionary file & reports number of items read."""
-        
-        self.words = self.parse(filename)
-        print(f"{len(self.words)} word{len("s" self.words != 1 else "")} read")
-    
+    # appended to a dictionary's filename to name its index
+    INDEX_SUFFIX = ".idx"
+
+    # whether dictionaries have category headers; see category
+    CATEGORIZED = False
+
+    def __init__(self, filename, indexed=False, weighted=False, sample=None):
+        """Reads a dictionary file & reports number of items read.
+
+        If indexed, only an index of the words' offsets in the file is kept
+        in memory; see LineIndex. If weighted, each line of the file holds a
+        word followed by its frequency. If sample is given, only that many
+        words, sampled from the file in one streaming pass, are kept; the
+        file may then also be gzip-compressed, "-" for standard input or an
+        open file (see open_source).
+        """
+
+        # weights of each word (if weighted), & the same as probabilities or
+        # cumulative weights; computed when first needed
+        self.weights = None
+        self.probabilities = None
+        self.cum_weights = None
+
+        # category => list of (start, end) ranges of the indices of its words,
+        # & the cumulative weights of its words (if weighted)
+        self.categories = {}
+        self.category_cum_weights = {}
+
+        if sample is not None:
+            if indexed or weighted:
+                raise ValueError("sampled dictionaries can't be indexed or weighted")
+
+            self.words, count = self.parse_sample(filename, sample)
+            print(f"{count} word{'s' if count != 1 else ''} read")
+            return
+
+        if indexed:
+            split = self.split if weighted else None
+            category = self.category if self.CATEGORIZED else None
+            self.words = LineIndex(filename, self.INDEX_SUFFIX, self.is_word, split, category)
+            self.weights = self.words.weights
+            self.categories = self.words.categories
+        else:
+            self.words, self.weights, self.categories = self.parse_file(filename, weighted)
+
+        if self.weights is not None:
+            self.category_cum_weights = {
+                name: array('d', accumulate(
+                    self.weights[i] for start, end in ranges for i in range(start, end)
+                ))
+                for name, ranges in self.categories.items()
+            }
+
+        print(f"{len(self.words)} word{'s' if len(self.words) != 1 else ''} read")
+
+    def is_word(self, line):
+        """Whether a line of a dictionary file holds a word."""
+
+        return True
+
+    def category(self, line):
+        """The name of the category a line of a dictionary file starts, or None
+        if it doesn't start one; plain dictionaries have no categories."""
+
+        return None
+
     def parse(self, filename):
         """Parses a dictionary file into a list of words."""
 
+        return self.parse_file(filename)[0]
+
+    def parse_sample(self, source, k):
+        """Reservoir-samples k words from a source of lines in one pass.
+
+        Returns
+        -------
+        (list, int)
+            The sampled words & the number of words in the source.
+        """
+
+        with open_source(source) as file:
+            return reservoir_sample((word.strip() for word in file if self.is_word(word)), k)
+
+    def split(self, line):
+        """Splits a line of a weighted dictionary into its word & frequency;
+        words without a frequency have a frequency of 1."""
+
+        parts = line.rsplit(None, 1)
+        if len(parts) == 2:
+            try:
+                return parts[0].strip(), float(parts[1])
+            except ValueError:
+                pass
+
+        return line.strip(), 1.0
+
+    def parse_file(self, filename, weighted=False):
+        """Parses a dictionary file into a list of words, an array of their
+        frequencies if weighted (otherwise None) & the ranges of indices of
+        the words in each category."""
+
+        words = []
+        weights = array('d') if weighted else None
+        categories = CategoryRanges()
+
         with open(filename, 'r') as file:
-            return [word.strip() for word in file]
+            for line in file:
+                name = self.category(line)
+                if name is not None:
+                    categories.header(name, len(words))
+                elif self.is_word(line):
+                    if weighted:
+                        word, weight = self.split(line)
+                        weights.append(weight)
+                    else:
+                        word = line.strip()
+                    words.append(word)
+
+        return words, weights, categories.end(len(words))
+
+    def random(self, category=None):
+        """Retrieves a random word, from the given category if any.
+
+        Raises
+        ------
+        KeyError
+            If there's no category with the given name.
+        """
+
+        if category is not None:
+            return self.words[self.category_index(category)]
+
+        if self.weights is not None:
+            return self.choices(1)[0]
 
-    def random(self):
-        """Retrieves a random word."""
         return random.choice(self.words)
 
+    def category_index(self, category):
+        """Picks the index of a random word in a category, in proportion to
+        the words' weights if weighted."""
+
+        ranges = self.categories[category]
+
+        # position of the word among those of the category; weighted picks
+        # are a binary search of the category's cumulative weights
+        if self.weights is not None:
+            cum_weights = self.category_cum_weights[category]
+            i = random.choices(range(len(cum_weights)), cum_weights=cum_weights)[0]
+        else:
+            i = random.randrange(sum(end - start for start, end in ranges))
+
+        # categories are almost always a single range, making this O(1)
+        for start, end in ranges:
+            if i < end - start:
+                return start + i
+            i -= end - start
+
+    def choices(self, k, replace=True):
+        """Retrieves k random words, with or without replacement."""
+
+        return list(map(self.words.__getitem__, self.indices(k, replace)))
+
+    def sample(self, k):
+        """Retrieves k distinct random words (k random words without
+        replacement)."""
+
+        return self.choices(k, replace=False)
+
+    def indices(self, k, replace):
+        """Generates the indices of k random words, with or without
+        replacement, in proportion to their weights if weighted.
+
+        Indices are generated in one vectorized call if NumPy is available.
+        Either way, the draws follow the random module's state, so seeding
+        it with random.seed makes them reproducible.
+        """
+
+        n = len(self.words)
+
+        if numpy is not None:
+            rng = numpy.random.default_rng(random.getrandbits(64))
+            if self.weights is None:
+                if replace:
+                    return rng.integers(0, n, k).tolist()
+                return rng.choice(n, k, replace=False).tolist()
+
+            if self.probabilities is None:
+                weights = numpy.frombuffer(self.weights, dtype=numpy.float64)
+                self.probabilities = weights / weights.sum()
+            if not replace and k > numpy.count_nonzero(self.probabilities):
+                raise ValueError("sample larger than the number of words with a nonzero weight")
+            return rng.choice(n, k, replace=replace, p=self.probabilities).tolist()
+
+        if self.weights is None:
+            return random.choices(range(n), k=k) if replace else random.sample(range(n), k)
+
+        if replace:
+            if self.cum_weights is None:
+                self.cum_weights = list(accumulate(self.weights))
+            return random.choices(range(n), cum_weights=self.cum_weights, k=k)
+
+        # weighted sampling without replacement (Efraimidis & Spirakis):
+        # the k words with the largest keys of log(u) / weight
+        keys = (
+            (log(1.0 - random.random()) / weight, i)
+            for i, weight in enumerate(self.weights) if weight > 0
+        )
+        chosen = nlargest(k, keys)
+        if len(chosen) < k:
+            raise ValueError("sample larger than the number of words with a nonzero weight")
+
+        return [i for _, i in chosen]
+
 class SpecialWordFinder(WordFinder):
     """Specialized variant of WordFinder that excludes blank lines & comments.
 
@@ -52,10 +562,49 @@ class SpecialWordFinder(WordFinder):
 
     >>> wf.random() in {"apple", "orange", "carrot", "cauliflower"}
     True
+
+    Comment lines are headers naming the category of the words after them,
+    and words can be drawn from a single category:
+
+    >>> wf.random(category="fruits") in {"apple", "orange"}
+    True
+
+    >>> wf = SpecialWordFinder("categorizedwords.txt", indexed=True)
+    4 words read
+
+    >>> sorted(wf.words[i] for i in range(len(wf.words)))
+    ['apple', 'carrot', 'cauliflower', 'orange']
+
+    >>> wf.categories
+    {'fruits': [(0, 2)], 'vegetables': [(2, 4)]}
+
+    >>> wf.random(category="vegetables") in {"carrot", "cauliflower"}
+    True
+
+    >>> wf = SpecialWordFinder("categorizedwords.txt", weighted=True)
+    4 words read
+
+    >>> wf.random(category="fruits") in {"apple", "orange"}
+    True
+
+    >>> wf = SpecialWordFinder("categorizedwords.txt", sample=3)
+    4 words read
+
+    >>> set(wf.words) < {"apple", "orange", "carrot", "cauliflower"}
+    True
     """
 
-    def parse(self, filename):
-        """Parses a dictionary file into a list of words, skipping blank lines + comments."""
+    INDEX_SUFFIX = ".special.idx"
+    CATEGORIZED = True
 
-        with open(filename, 'r') as file:
-            return [word.strip() for word in file if word.strip() and not word.startswith("#")]
+    def is_word(self, line):
+        """Whether a line of a dictionary file holds a word, i.e. it's
+        neither blank nor a comment."""
+
+        return bool(line.strip()) and not line.startswith("#")
+
+    def category(self, line):
+        """The name of the category a comment line starts, or None if the
+        line isn't a comment."""
+
+        return line[1:].strip() if line.startswith("#") else None
@@ -1,7 +1,10 @@
-from boggle import Boggle
-from flask import Flask, jsonify, make_response, redirect, request, render_template, session
-from os import path
+from boggle import Boggle, BoardPool
+from leaderboard import Leaderboard
+from flask import Flask, Response, jsonify, make_response, redirect, request, render_template, session
+from os import environ, path
 from secrets import token_urlsafe
+from store import GameState, make_store
+from typing import *
 
 def get_key(key_file: str = ".flaskkey", num_bytes: int = 64) -> str:
     """Generates a cryptographically random key and saves it
@@ -36,41 +39,122 @@ def get_key(key_file: str = ".flaskkey", num_bytes: int = 64) -> str:
 app = Flask(__name__)
 app.config["SECRET_KEY"] = get_key()
 boggle = Boggle()
+boards = BoardPool(boggle)
+
+# game state is kept server-side; the session cookie only holds its ID. The
+# default SQLite store is shared by every worker process, unlike "memory".
+games = make_store(environ.get("BOGGLE_STORE", "sqlite:games.db"))
+leaderboard = Leaderboard(environ.get("BOGGLE_LEADERBOARD", "leaderboard.db"))
+
+def load_state() -> Tuple[str, GameState]:
+    """Retrieves the current session's ID & game state, starting a new
+    session if it has none yet."""
+
+    session_id = session.get("id")
+    state = games.get(session_id) if session_id is not None else None
+    if state is None:
+        session_id = games.new_id()
+        state = GameState()
+        session["id"] = session_id
+
+    return session_id, state
+
+def no_game_error() -> Response:
+    """Response for word submissions made before a game has been started."""
+
+    return make_response(jsonify({ "error": "no game in progress" }), 400)
 
 @app.route("/")
 def homepage():
     """Renders the homepage and creates a new board for the given session."""
 
-    board = session.get("board", None)
-    if board is None or request.args.get("reset", False):
-        session["board"] = boggle.make_board()
-        session["words"] = {}
+    session_id, state = load_state()
+    if state.board is None or request.args.get("reset", False):
+        # boards come pre-solved, so word submissions are only set lookups
+        state.board, state.solution = boards.get()
+        state.words = []
+        games.put(session_id, state)
         return redirect("/")
     
-    return render_template("board.html", board=session["board"])
+    return render_template("board.html", board=state.board)
 
 @app.route("/submit", methods=["POST"])
 def submit_word():
     """Handle request to check the validity of a word on a given session's board."""
 
-    result = boggle.check_valid_word(session.get("board"), request.json["word"])
+    session_id, state = load_state()
+    if state.board is None:
+        return no_game_error()
+
+    word = request.json["word"]
+    result = boggle.classify(state.solution, word)
+    if result == Boggle.RESULT_OK and word not in state.words:
+        state.words.append(word)
+        games.put(session_id, state)
+
     return jsonify({ "result": result })
 
+@app.route("/submit/batch", methods=["POST"])
+def submit_words():
+    """Handle request to check the validity of many words on a given session's board
+    at once. Responds with the result for each distinct word."""
+
+    words = request.json["words"]
+    if not isinstance(words, list) or not all(isinstance(w, str) for w in words):
+        return make_response(jsonify({ "error": '"words" must be a list of strings' }), 400)
+
+    session_id, state = load_state()
+    if state.board is None:
+        return no_game_error()
+
+    results = {word: boggle.classify(state.solution, word) for word in set(words)}
+    found = [
+        word for word in dict.fromkeys(words)
+        if results[word] == Boggle.RESULT_OK and word not in state.words
+    ]
+    if found:
+        state.words.extend(found)
+        games.put(session_id, state)
+
+    return jsonify({ "results": results })
+
 @app.route("/highscore", methods=["GET"])
 def get_highscore():
-    """Retreives the current session's highest score."""
-    return jsonify({ "score": session.get("highscore", 0) })
+    """Retreives the current session's highest score, along with its global rank
+    and the leaderboard's top scores."""
+
+    session_id, state = load_state()
+    return jsonify({
+        "score": state.highscore,
+        "rank": leaderboard.rank(session_id),
+        "players": len(leaderboard),
+        "top": leaderboard.top()
+    })
 
 @app.route("/highscore", methods=["POST"])
 def post_highscore():
     """Posts the current session's score to the server. If larger than the highscore,
     it is overwritten with the given score.
+
+    The score is that of the words found on the current board; a score given by the
+    client must be a whole number no larger than it.
     
     Also increments how many completed games the player has had."""
-    if request.json["score"] > session.get("highscore", 0):
-        session["highscore"] = request.json["score"]
 
-    session["games"] = session.get("games", 0) + 1
+    session_id, state = load_state()
+    found = sum(len(word) for word in state.words)
+
+    data = request.get_json(silent=True)
+    score = data.get("score", found) if isinstance(data, dict) else found
+    if not isinstance(score, int) or isinstance(score, bool) or not 0 <= score <= found:
+        return make_response(jsonify({ "error": f'"score" must be a whole number from 0 to {found}' }), 400)
+
+    if score > state.highscore:
+        state.highscore = score
+
+    state.games += 1
+    games.put(session_id, state)
+    leaderboard.submit(session_id, score)
 
     return ""
 
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+"""Benchmarks for the Boggle solver.
+
+Run from this directory with ``python bench.py`` for the full suite, or
+``python bench.py find-from`` to compare `Boggle.find_from` against its
+original implementation. Results of the suite can be saved with ``--save``
+and later runs checked against them with ``--compare``, which exits with
+an error if any operation got slower than the given tolerance.
+"""
+
+from argparse import ArgumentParser
+from boggle import Boggle
+from os import path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import *
+import json
+import random
+import sys
+import tracemalloc
+
+def legacy_find_from(
+    board: List[List[str]],
+    word: str,
+    y: int,
+    x: int,
+    seen: Set[Tuple[int, int]] = set()
+) -> bool:
+    """The original set-based implementation of `Boggle.find_from`, kept
+    as a baseline to compare against."""
+
+    if len(board) != len(board[0]):
+        raise ValueError("board must be a square list")
+
+    if y < 0 or y >= len(board) or x < 0 or x >= len(board):
+        return False
+
+    if board[y][x] != word[0]:
+        return False
+
+    if (y, x) in seen:
+        return False
+
+    if len(word) == 1:
+        return True
+
+    seen = seen | {(y, x)}
+
+    for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, 1), (1, -1), (-1, 1)):
+        if legacy_find_from(board, word[1:], y + dy, x + dx, seen):
+            return True
+
+    return False
+
+def time_find_from(
+    find_from: Callable[..., bool],
+    board: List[List[str]],
+    words: Sequence[str]
+) -> Tuple[float, int]:
+    """Times searching for every word from every cell of a board holding
+    its first letter.
+
+    Returns
+    -------
+    `Tuple[float, int]`
+        Elapsed seconds & the number of words found.
+    """
+
+    size = len(board)
+    starts = [
+        [(y, x) for y in range(size) for x in range(size) if board[y][x] == word[0]]
+        for word in words
+    ]
+    found = 0
+
+    start = perf_counter()
+    for word, cells in zip(words, starts):
+        for y, x in cells:
+            if find_from(board, word, y, x):
+                found += 1
+                break
+
+    return perf_counter() - start, found
+
+def sample_words(boggle: Boggle, board: List[List[str]], dictionary: Sequence[str], count: int) -> List[str]:
+    """Returns *count* words to look for on a board: half of them on the board,
+    the rest random dictionary words."""
+
+    on_board = sorted(w for w in boggle.solve(board) if w.isalpha())
+    sample = random.sample(on_board, min(count // 2, len(on_board)))
+    return sample + random.sample(dictionary, min(count - len(sample), len(dictionary)))
+
+def bench_find_from(boggle: Boggle, sizes: Iterable[int], boards: int, words: int, seed: int):
+    """Compares the legacy and bitmask-based `find_from` on seeded random boards."""
+
+    dictionary = sorted(boggle.words)
+
+    print(f"{'size':>6} {'words':>7} {'legacy (s)':>11} {'bitmask (s)':>12} {'speedup':>8}")
+    for size in sizes:
+        random.seed(seed)
+        legacy_total = bitmask_total = 0.0
+        count = 0
+
+        for _ in range(boards):
+            board = boggle.make_board(size)
+
+            sample = [w.upper() for w in sample_words(boggle, board, dictionary, words)]
+
+            legacy, legacy_found = time_find_from(legacy_find_from, board, sample)
+            bitmask, bitmask_found = time_find_from(boggle.find_from, board, sample)
+            if legacy_found != bitmask_found:
+                raise AssertionError(f"mismatch on {size}x{size} board: {board}")
+
+            legacy_total += legacy
+            bitmask_total += bitmask
+            count += len(sample)
+
+        print(f"{size:>6} {count:>7} {legacy_total:>11.4f} {bitmask_total:>12.4f} "
+            f"{legacy_total / bitmask_total:>7.2f}x")
+
+def percentile(samples: Sequence[float], p: float) -> float:
+    """Returns the *p*th percentile of sorted *samples*, by nearest rank.
+
+    >>> percentile([1, 2, 3, 4], 50), percentile([1, 2, 3, 4], 99)
+    (2, 4)
+    """
+
+    return samples[max(0, min(len(samples) - 1, round(p / 100 * len(samples)) - 1))]
+
+def measure(operation: Callable[..., Any], calls: Sequence[tuple]) -> Tuple[List[float], int]:
+    """Calls *operation* once for each argument tuple in *calls*.
+
+    Returns
+    -------
+    `Tuple[List[float], int]`
+        The sorted latency of each call in seconds & the peak memory
+        allocated while making all of the calls, in bytes. Memory is traced
+        in a second, separate pass so it doesn't skew the latencies.
+    """
+
+    latencies = []
+    for args in calls:
+        start = perf_counter()
+        operation(*args)
+        latencies.append(perf_counter() - start)
+
+    tracemalloc.start()
+    for args in calls:
+        operation(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return sorted(latencies), peak
+
+def load_dictionary(dict_path: str, size: int, directory: str, seed: int) -> Boggle:
+    """Loads a game with a reproducible random subset of *size* words of a
+    dictionary, or all of it if *size* is 0."""
+
+    if size == 0:
+        return Boggle(dict_path)
+
+    with open(dict_path) as dict_file:
+        words = [w.strip() for w in dict_file]
+
+    random.seed(seed)
+    subset_path = path.join(directory, f"words-{size}.txt")
+    with open(subset_path, "w") as subset_file:
+        subset_file.writelines(w + "\n" for w in sorted(random.sample(words, min(size, len(words)))))
+
+    return Boggle(subset_path)
+
+def bench_suite(
+    dict_path: str,
+    dict_sizes: Iterable[int],
+    sizes: Iterable[int],
+    boards: int,
+    words: int,
+    seed: int
+) -> List[Dict[str, Any]]:
+    """Benchmarks the solver's operations on seeded boards of each size, for
+    dictionaries of each size, printing & returning the results."""
+
+    results = []
+
+    print(f"{'dict':>7} {'size':>5} {'operation':<17} {'calls':>6} {'words/s':>10} "
+        f"{'p50 (us)':>9} {'p90 (us)':>9} {'p99 (us)':>9} {'peak (KiB)':>11}")
+
+    with TemporaryDirectory() as directory:
+        for dict_size in dict_sizes:
+            boggle = load_dictionary(dict_path, dict_size, directory, seed)
+            dictionary = sorted(boggle.words)
+
+            for size in sizes:
+                random.seed(seed)
+                board_list = [boggle.make_board(size) for _ in range(boards)]
+                samples = [sample_words(boggle, board, dictionary, words) for board in board_list]
+
+                # (name, operation, argument tuples, words handled by the calls)
+                operations = (
+                    ("make_board", boggle.make_board,
+                        [(size,)] * boards, 0),
+                    ("solve", boggle.solve,
+                        [(board,) for board in board_list],
+                        sum(len(boggle.solve(board)) for board in board_list)),
+                    ("find", boggle.find,
+                        [(b, w.upper()) for b, s in zip(board_list, samples) for w in s],
+                        sum(map(len, samples))),
+                    ("check_valid_word", boggle.check_valid_word,
+                        [(b, w) for b, s in zip(board_list, samples) for w in s],
+                        sum(map(len, samples))),
+                )
+
+                for name, operation, calls, handled in operations:
+                    latencies, peak = measure(operation, calls)
+                    result = {
+                        "dict": len(boggle.words),
+                        "size": size,
+                        "operation": name,
+                        "calls": len(calls),
+                        "words_per_second": handled / sum(latencies) if handled else None,
+                        "p50": percentile(latencies, 50),
+                        "p90": percentile(latencies, 90),
+                        "p99": percentile(latencies, 99),
+                        "peak": peak
+                    }
+                    results.append(result)
+
+                    rate = f"{result['words_per_second']:>10.0f}" if handled else f"{'-':>10}"
+                    print(f"{result['dict']:>7} {size:>5} {name:<17} {len(calls):>6} {rate} "
+                        f"{result['p50'] * 1e6:>9.1f} {result['p90'] * 1e6:>9.1f} "
+                        f"{result['p99'] * 1e6:>9.1f} {peak / 1024:>11.1f}")
+
+    return results
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> bool:
+    """Prints the operations whose median latency regressed by more than
+    *tolerance* (a fraction) compared to *baseline*; returns whether none did."""
+
+    key = lambda r: (r["dict"], r["size"], r["operation"])
+    previous = {key(r): r for r in baseline}
+
+    ok = True
+    for result in results:
+        before = previous.get(key(result))
+        if before is not None and result["p50"] > before["p50"] * (1 + tolerance):
+            ok = False
+            print(f"REGRESSION: {result['operation']} on {result['size']}x{result['size']} "
+                f"boards with {result['dict']} words: p50 {before['p50'] * 1e6:.1f}us "
+                f"=> {result['p50'] * 1e6:.1f}us", file=sys.stderr)
+
+    return ok
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", nargs="?", default="suite", choices=["suite", "find-from"],
+        help="benchmark to run")
+    parser.add_argument("--dict", default="words.txt", help="dictionary file")
+    parser.add_argument("--dict-sizes", type=int, nargs="+", default=[10000, 50000, 0],
+        help="dictionary sizes for the suite; 0 is the whole dictionary")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 15], help="board sizes")
+    parser.add_argument("--boards", type=int, default=10, help="boards per size")
+    parser.add_argument("--words", type=int, default=200, help="words searched per board")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--save", help="file to save the suite's results to, as JSON")
+    parser.add_argument("--compare", help="results saved by an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+        help="allowed slowdown of median latencies when comparing, as a fraction")
+    args = parser.parse_args()
+
+    if args.benchmark == "find-from":
+        bench_find_from(Boggle(args.dict), args.sizes, args.boards, args.words, args.seed)
+        sys.exit()
+
+    results = bench_suite(args.dict, args.dict_sizes, args.sizes, args.boards, args.words, args.seed)
+
+    if args.save:
+        with open(args.save, "w") as save_file:
+            json.dump(results, save_file, indent=4)
+
+    if args.compare:
+        with open(args.compare) as compare_file:
+            if not compare(results, json.load(compare_file), args.tolerance):
+                sys.exit(1)
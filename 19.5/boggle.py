@@ -1,9 +1,91 @@
 """Utilities related to Boggle game."""
 
-from random import choice
+from dawg import CompiledDawg, Dawg, load_dawg
+from functools import lru_cache
+from multiprocessing import Pool
+from queue import Empty, Queue
+from random import choice, shuffle
+from threading import Thread
 from typing import *
+import os
 import string
 
+def flatten(board: Sequence[Sequence[str]]) -> List[str]:
+    """Flatten a square board into a list of cells, numbered row by row.
+
+    >>> flatten([["A", "B"], ["C", "D"]])
+    ['A', 'B', 'C', 'D']
+    """
+
+    size = len(board)
+    if any(len(row) != size for row in board):
+        raise ValueError("board must be a square list")
+
+    return [letter for row in board for letter in row]
+
+def letter_index(board: Sequence[Sequence[str]]) -> Dict[str, List[int]]:
+    """Map each letter on a square board to the indices of the cells holding it.
+
+    >>> letter_index([["A", "B"], ["B", "A"]])
+    {'A': [0, 3], 'B': [1, 2]}
+    """
+
+    index = {}
+    for cell, letter in enumerate(flatten(board)):
+        index.setdefault(letter, []).append(cell)
+
+    return index
+
+@lru_cache(maxsize=None)
+def adjacency(size: int) -> Tuple[Tuple[Tuple[int, int, int], ...], ...]:
+    """Return the neighbours of every cell of a square board, as tuples of
+    their cell index, row & column.
+
+    Computed once per board size; cell (y, x) has index ``y * size + x``.
+
+    >>> adjacency(2)[0]
+    ((1, 0, 1), (2, 1, 0), (3, 1, 1))
+    """
+
+    return tuple(
+        tuple(
+            (ny * size + nx, ny, nx)
+            for ny in range(max(y - 1, 0), min(y + 2, size))
+            for nx in range(max(x - 1, 0), min(x + 2, size))
+            if (ny, nx) != (y, x)
+        )
+        for y in range(size)
+        for x in range(size)
+    )
+
+def _find_path(
+    board: Sequence[Sequence[str]],
+    neighbours: Sequence[Sequence[Tuple[int, int, int]]],
+    word: str,
+    index: int,
+    cell: int,
+    seen: int
+) -> bool:
+    """Can the rest of word be found from cell, given word[index] is on it?
+
+    The visited cells are kept in the bits of *seen*, so a path is extended
+    without building any new sets, slicing the word or copying the board.
+    """
+
+    index += 1
+    if index == len(word):
+        return True
+
+    seen |= 1 << cell
+    letter = word[index]
+    for n, y, x in neighbours[cell]:
+        if board[y][x] == letter and not seen >> n & 1:
+            if _find_path(board, neighbours, word, index, n, seen):
+                return True
+
+    # Couldn't find the next letter, so this path is dead
+    return False
+
 class Boggle():
     """Class containing functionality for a Boggle game."""
 
@@ -11,18 +93,33 @@ class Boggle():
     RESULT_NOT_WORD = "not-word"
     RESULT_NOT_ON_BOARD = "not-on-board"
 
-    def __init__(self, dict_path: str = "words.txt"):
+    # shortest word the client accepts
+    MIN_WORD_LENGTH = 3
+
+    # Big Boggle letter dice ("Qu" is played as Q); bigger boards reuse them
+    DICE = (
+        "AAAFRS", "AAEEEE", "AAFIRS", "ADENNN", "AEEEEM",
+        "AEEGMU", "AEGMNN", "AFIRSY", "BJKQXZ", "CCNSTW",
+        "CEIILT", "CEILPT", "CEIPST", "DDLNOR", "DHHLOR",
+        "DHHNOT", "DHLNOR", "EIIITT", "EMOTTT", "ENSSSU",
+        "FIPRSY", "GORRVW", "HIPRRY", "NOOTUW", "OOOTTU"
+    )
+
+    def __init__(self, dict_path: str = "words.txt", cache_size: int = 1024):
         """Base class for Boggle games."""
 
+        self.dict_path = os.path.abspath(dict_path)
         self.words = self.read_dict(dict_path)
+        self._cached_solve = lru_cache(maxsize=cache_size)(
+            lambda board: frozenset(self.solve(board))
+        )
+        self._cached_index = lru_cache(maxsize=cache_size)(letter_index)
 
-    def read_dict(self, dict_path: str) -> Collection[str]:
-        """Read and return all words in dictionary."""
+    def read_dict(self, dict_path: str) -> Union[Dawg, CompiledDawg]:
+        """Read and return all words in dictionary, compiling it to a binary
+        file next to it on first use."""
 
-        dict_file = open(dict_path)
-        words = {w.strip() for w in dict_file}
-        dict_file.close()
-        return words
+        return load_dawg(dict_path)
 
     def make_board(self, board_size: int = 5) -> List[List[str]]:
         """Make and return a random boggle board."""
@@ -35,15 +132,143 @@ class Boggle():
 
         return board
 
+    def roll_board(self, board_size: int = 5) -> List[List[str]]:
+        """Make and return a board by shuffling & rolling letter dice, giving
+        letters in roughly the proportions they're used in words."""
+
+        dice = [Boggle.DICE[i % len(Boggle.DICE)] for i in range(board_size * board_size)]
+        shuffle(dice)
+
+        return [
+            [choice(die) for die in dice[y * board_size:(y + 1) * board_size]]
+            for y in range(board_size)
+        ]
+
+    def generate_board(self,
+        board_size: int = 5,
+        min_words: int = 150,
+        min_score: int = 0,
+        attempts: int = 100
+    ) -> Tuple[List[List[str]], FrozenSet[str]]:
+        """Roll boards until one has at least *min_words* playable words worth
+        at least *min_score* points.
+
+        Returns
+        -------
+        `Tuple[List[List[str]], FrozenSet[str]]`
+            The board & its solution. If no board meets the minimums within
+            *attempts* rolls, the best one rolled is returned instead.
+        """
+
+        best = None
+        for _ in range(attempts):
+            board = self.roll_board(board_size)
+            solution = self.solutions(board)
+            playable = self.playable(solution)
+
+            rank = (len(playable) >= min_words and self.score(playable) >= min_score,
+                len(playable))
+            if best is None or rank > best[0]:
+                best = (rank, board, solution)
+            if rank[0]:
+                break
+
+        return best[1], best[2]
+
+    def playable(self, words: Iterable[str]) -> List[str]:
+        """Return the words the client accepts as guesses."""
+
+        return [
+            w for w in words
+            if len(w) >= Boggle.MIN_WORD_LENGTH and w.isalpha() and w.islower()
+        ]
+
+    def score(self, words: Iterable[str]) -> int:
+        """Return the total score of a collection of playable words."""
+
+        return sum(len(w) for w in words)
+
+    def solve(self, board: Sequence[Sequence[str]]) -> Set[str]:
+        """Find every dictionary word on a board in one prefix-pruned traversal.
+
+        Board letters match dictionary letters of either case, so the returned
+        words are spelled exactly as they appear in the dictionary.
+        """
+
+        cells = flatten(board)
+        neighbours = adjacency(len(board))
+        variants = [tuple({c.upper(), c.lower()}) for c in cells]
+
+        step = self.words.step
+        is_final = self.words.is_final
+        found = set()
+
+        def visit(node, cell: int, seen: int, prefix: str):
+            if is_final(node):
+                found.add(prefix)
+
+            seen |= 1 << cell
+            for n, _, _ in neighbours[cell]:
+                if not seen >> n & 1:
+                    extend(node, n, seen, prefix)
+
+        def extend(node, cell: int, seen: int, prefix: str):
+            for letter in variants[cell]:
+                child = step(node, letter)
+                if child is not None:
+                    visit(child, cell, seen, prefix + letter)
+
+        root = self.words.root
+        for cell in range(len(cells)):
+            extend(root, cell, 0, "")
+
+        return found
+
+    def solve_many(self,
+        boards: Iterable[Sequence[Sequence[str]]],
+        processes: Optional[int] = None,
+        chunksize: int = 16
+    ) -> Iterator[Set[str]]:
+        """Solve many boards across a pool of worker processes.
+
+        Workers map the same compiled dictionary file, so its pages are
+        shared rather than copied into every process. Solutions are yielded
+        as they're ready, in the same order as *boards*.
+
+        Parameters
+        ----------
+        boards: `Iterable[Sequence[Sequence[str]]]`
+            Boards to solve; consumed lazily.
+        processes: `Optional[int]` = None
+            Number of worker processes; defaults to the number of CPUs.
+            With 1, boards are solved in this process.
+        chunksize: `int` = 16
+            Number of boards sent to a worker at a time.
+        """
+
+        if processes == 1:
+            yield from map(self.solve, boards)
+            return
+
+        with Pool(processes, _init_worker, (self.dict_path,)) as pool:
+            yield from pool.imap(_solve_in_worker, boards, chunksize)
+
+    def solutions(self, board: Sequence[Sequence[str]]) -> FrozenSet[str]:
+        """Return the (cached) set of every dictionary word found on a board."""
+
+        return self._cached_solve(tuple(tuple(row) for row in board))
+
     def check_valid_word(self, board: List[List[str]], word: str) -> str:
         """Check if a word is a valid word in the dictionary and/or the boggle board"""
 
-        word_exists = word in self.words
-        valid_word = self.find(board, word.upper())
+        return self.classify(self.solutions(board), word)
+
+    def classify(self, solution: Container[str], word: str) -> str:
+        """Check a word against the solution of a board and the dictionary."""
 
-        if word_exists and valid_word:
+        if word in solution:
             result = Boggle.RESULT_OK
-        elif word_exists and not valid_word:
+        elif word in self.words:
             result = Boggle.RESULT_NOT_ON_BOARD
         else:
             result = Boggle.RESULT_NOT_WORD
@@ -55,106 +280,98 @@ class Boggle():
         word: str,
         y: int,
         x: int,
-        seen: Set[Tuple[int, int]] = set(),
-        path: List[Tuple[int, int]] = []
+        seen: int = 0,
+        index: int = 0
     ) -> bool:
-        """Can we find a word on board, starting at x, y?"""
+        """Can we find a word on board, starting at x, y?
 
-        if len(board) != len(board[0]):
-            raise ValueError("board must be a square list")
+        *seen* is a bitmask of cells (numbered ``y * size + x``) that may not
+        be used, and *index* is the position in *word* to start matching from.
+        """
+
+        size = len(board)
 
         # Out of range
-        if y < 0 or y >= len(board)or x < 0 or x >= len(board):
+        if y < 0 or y >= size or x < 0 or x >= size or index >= len(word):
             return False
 
-        # This is called recursively to find smaller and smaller words
-        # until all tries are exhausted or until success.
-
-        # Base case: this isn't the letter we're looking for.
+        # This isn't the letter we're looking for, or it's already been used
+        if board[y][x] != word[index]:
+            return False
 
-        if board[y][x] != word[0]:
+        cell = y * size + x
+        if seen >> cell & 1:
             return False
 
-        # Base case: we've used this letter before in this current path
+        if any(len(row) != size for row in board):
+            raise ValueError("board must be a square list")
 
-        if (y, x) in seen:
+        return _find_path(board, adjacency(size), word, index, cell, seen)
+
+    def find(self, board: List[List[str]], word: str) -> bool:
+        """Can word be found in board?"""
+
+        if not word:
             return False
 
-        # Base case: we are down to the last letter --- so we win!
-
-        if len(word) == 1:
-            return True
-
-        # Otherwise, this letter is good, so note that we've seen it,
-        # and try of all of its neighbors for the first letter of the
-        # rest of the word
-        # This next line is a bit tricky: we want to note that we've seen the
-        # letter at this location. However, we only want the child calls of this
-        # to get that, and if we used `seen.add(...)` to add it to our set,
-        # *all* calls would get that, since the set is passed around. That would
-        # mean that once we try a letter in one call, it could never be tried again,
-        # even in a totally different path. Therefore, we want to create a *new*
-        # seen set that is equal to this set plus the new letter. Being a new
-        # object, rather than a mutated shared object, calls that don't descend
-        # from us won't have this `y,x` point in their seen.
-        #
-        # To do this, we use the | (set-union) operator, read this line as
-        # "rebind seen to the union of the current seen and the set of point(y,x))."
-        #
-        # (this could be written with an augmented operator as "seen |= {(y, x)}",
-        # in the same way "x = x + 2" can be written as "x += 2", but that would seem
-        # harder to understand).
-
-        seen = seen | {(y, x)}
-
-        # adding diagonals
-
-        if y > 0:
-            if self.find_from(board, word[1:], y - 1, x, seen):
-                return True
+        neighbours = adjacency(len(board))
 
-        if y < len(board):
-            if self.find_from(board, word[1:], y + 1, x, seen):
+        # Only start from the cells holding the first letter and, win fast,
+        # should we find the word at that place. The cells of every letter
+        # are indexed once per board.
+        index = self._cached_index(tuple(tuple(row) for row in board))
+        for cell in index.get(word[0], ()):
+            if _find_path(board, neighbours, word, 0, cell, 0):
                 return True
 
-        if x > 0:
-            if self.find_from(board, word[1:], y, x - 1, seen):
-                return True
+        # We've tried every path from every starting square w/o luck.
+        return False
 
-        if x < len(board):
-            if self.find_from(board, word[1:], y, x + 1, seen):
-                return True
+# game used by solve_many's worker processes
+_worker_boggle = None
 
-        # diagonals
-        if y > 0 and x > 0:
-            if self.find_from(board, word[1:], y - 1, x - 1, seen):
-                return True
+def _init_worker(dict_path: str):
+    """Loads the dictionary in a solve_many worker process."""
 
-        if y < len(board) and x < len(board):
-            if self.find_from(board, word[1:], y + 1, x + 1, seen):
-                return True
+    global _worker_boggle
+    _worker_boggle = Boggle(dict_path, cache_size=0)
 
-        if x > 0 and y < len(board):
-            if self.find_from(board, word[1:], y + 1, x - 1, seen):
-                return True
+def _solve_in_worker(board: Sequence[Sequence[str]]) -> Set[str]:
+    """Solves a board in a solve_many worker process."""
 
-        if x < len(board) and y > 0:
-            if self.find_from(board, word[1:], y - 1, x + 1, seen):
-                return True
-        # Couldn't find the next letter, so this path is dead
+    return _worker_boggle.solve(board)
 
-        return False
+class BoardPool():
+    """Pool of pre-generated, pre-solved boards, refilled by a background thread.
 
-    def find(self, board: List[List[str]], word: str) -> bool:
-        """Can word be found in board?"""
+    The thread is started on first use (and restarted in a forked process),
+    so the pool is safe to create at import time in preforking servers.
+    """
 
-        # Find starting letter --- try every spot on board and,
-        # win fast, should we find the word at that place.
-        
-        for y in range(0, 5):
-            for x in range(0, 5):
-                if self.find_from(board, word, y, x):
-                    return True
+    def __init__(self, boggle: Boggle, size: int = 8, **options):
+        """Creates a pool of up to *size* boards generated by
+        `Boggle.generate_board` with the given keyword *options*."""
 
-        # We've tried every path from every starting square w/o luck.
-        return False
+        self.boggle = boggle
+        self.options = options
+        self.boards = Queue(maxsize=size)
+        self.pid = None
+
+    def fill(self):
+        """Keeps the pool full; runs in the background thread."""
+
+        while True:
+            self.boards.put(self.boggle.generate_board(**self.options))
+
+    def get(self) -> Tuple[List[List[str]], FrozenSet[str]]:
+        """Takes a board & its solution from the pool, generating one on the
+        spot only if the pool has run dry."""
+
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            Thread(target=self.fill, daemon=True).start()
+
+        try:
+            return self.boards.get_nowait()
+        except Empty:
+            return self.boggle.generate_board(**self.options)
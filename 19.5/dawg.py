@@ -0,0 +1,288 @@
+"""Directed acyclic word graph (DAWG) used as the Boggle dictionary."""
+
+from array import array
+from mmap import ACCESS_READ, mmap
+from os import path
+from typing import *
+import os
+import struct
+import tempfile
+
+# Key marking a node as the end of a word; can never collide with a letter.
+FINAL = ""
+
+# Header of a compiled DAWG: magic, format version, source file's modification
+# time & size, and node, edge & word counts. Tables are in native byte order,
+# so a file written on a machine of the other byte order reads a bad version.
+HEADER = struct.Struct("=4sIQQIII")
+MAGIC = b"DAWG"
+FORMAT = 1
+
+Node = Dict[str, Any]
+
+class Dawg():
+    """Minimal prefix trie with shared suffixes, supporting prefix-pruned searches.
+
+    >>> dawg = Dawg(["cat", "cats", "dog", "dogs"])
+    >>> "cat" in dawg, "ca" in dawg, len(dawg)
+    (True, False, 4)
+    >>> dawg.step(dawg.step(dawg.root, "c"), "a") is not None
+    True
+    >>> sorted(dawg)
+    ['cat', 'cats', 'dog', 'dogs']
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """Builds the graph from an iterable of words."""
+
+        self.root: Node = {}
+        self.count = 0
+
+        # Incremental construction of a minimal acyclic automaton from sorted
+        # input (Daciuk et al., 2000). Nodes of a finished prefix are merged
+        # with an identical node already in the register, if any.
+        register: Dict[Tuple, Node] = {}
+        unchecked: List[Tuple[Node, str, Node]] = []
+        previous = ""
+
+        def minimize(down_to: int):
+            while len(unchecked) > down_to:
+                parent, letter, child = unchecked.pop()
+                key = tuple((c, id(n)) for c, n in child.items())
+                existing = register.get(key)
+                if existing is None:
+                    register[key] = child
+                else:
+                    parent[letter] = existing
+
+        for word in sorted(set(words)):
+            common = 0
+            for a, b in zip(word, previous):
+                if a != b:
+                    break
+                common += 1
+
+            minimize(common)
+            node = unchecked[-1][2] if unchecked else self.root
+            for letter in word[common:]:
+                child = {}
+                node[letter] = child
+                unchecked.append((node, letter, child))
+                node = child
+
+            node[FINAL] = True
+            self.count += 1
+            previous = word
+
+        minimize(0)
+
+    def step(self, node: Node, letter: str) -> Optional[Node]:
+        """Returns the node reached by following *letter* from *node*, if any."""
+
+        return node.get(letter) if letter else None
+
+    def is_final(self, node: Node) -> bool:
+        """Whether the path leading to *node* spells a complete word."""
+
+        return FINAL in node
+
+    def __contains__(self, word: object) -> bool:
+        """Whether or not *word* is in the dictionary."""
+
+        if not isinstance(word, str) or not word:
+            return False
+
+        node = self.root
+        for letter in word:
+            node = node.get(letter)
+            if node is None:
+                return False
+
+        return FINAL in node
+
+    def __len__(self) -> int:
+        """Number of words in the dictionary."""
+
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over every word in the dictionary in sorted order."""
+
+        stack = [(self.root, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if FINAL in node:
+                yield prefix
+            for letter in sorted((l for l in node if l != FINAL), reverse=True):
+                stack.append((node[letter], prefix + letter))
+
+class CompiledDawg():
+    """Read-only DAWG stored in a memory-mapped binary file.
+
+    The file holds a header followed by four flat tables: the first edge of
+    every node (plus a sentinel), the target node of every edge, a final flag
+    for every node and the letter of every edge. Edges of a node are stored
+    contiguously, so nodes are plain integers and the root is node 0. As the
+    file is mapped read-only, the operating system shares its pages between
+    every process using it.
+    """
+
+    def __init__(self, filename: str):
+        """Maps a compiled DAWG file written by `compile_dawg`."""
+
+        with open(filename, "rb") as file:
+            self.map = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+        magic, fmt, _, _, nodes, edges, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"{filename} is not a compiled DAWG")
+
+        view = memoryview(self.map)
+        offset = HEADER.size
+        self.edges = view[offset:offset + 4 * (nodes + 1)].cast("I")
+        offset += 4 * (nodes + 1)
+        self.targets = view[offset:offset + 4 * edges].cast("I")
+        offset += 4 * edges
+        self.finals = view[offset:offset + nodes]
+        offset += nodes
+        self.letters = offset
+
+        self.root = 0
+
+    def step(self, node: int, letter: str) -> Optional[int]:
+        """Returns the node reached by following *letter* from *node*, if any."""
+
+        code = _CODES.get(letter)
+        if code is None:
+            return None
+
+        base = self.letters
+        i = self.map.find(code, base + self.edges[node], base + self.edges[node + 1])
+        return None if i < 0 else self.targets[i - base]
+
+    def is_final(self, node: int) -> bool:
+        """Whether the path leading to *node* spells a complete word."""
+
+        return bool(self.finals[node])
+
+    def __contains__(self, word: object) -> bool:
+        """Whether or not *word* is in the dictionary."""
+
+        if not isinstance(word, str) or not word:
+            return False
+
+        node = self.root
+        for letter in word:
+            node = self.step(node, letter)
+            if node is None:
+                return False
+
+        return self.is_final(node)
+
+    def __len__(self) -> int:
+        """Number of words in the dictionary."""
+
+        return self.count
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterates over every word in the dictionary in sorted order."""
+
+        base = self.letters
+        stack = [(self.root, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if self.finals[node]:
+                yield prefix
+            for i in reversed(range(self.edges[node], self.edges[node + 1])):
+                stack.append((self.targets[i], prefix + chr(self.map[base + i])))
+
+# single-byte codes of every letter a compiled DAWG can hold
+_CODES = {chr(i): bytes((i,)) for i in range(256)}
+
+def compile_dawg(dawg: Dawg, filename: str, source_stat: os.stat_result):
+    """Writes *dawg* to *filename* in the format read by `CompiledDawg`.
+
+    The file is written under a temporary name and then renamed, so processes
+    compiling the same dictionary at once never see a partial file.
+
+    Raises
+    ------
+    `UnicodeEncodeError`
+        If a word holds a letter that doesn't fit in a single byte.
+    """
+
+    # number nodes breadth-first, so edges are laid out node by node
+    ids = {id(dawg.root): 0}
+    nodes = [dawg.root]
+    edges = [0]
+    targets = []
+    letters = []
+
+    for node in nodes:
+        for letter in sorted(l for l in node if l != FINAL):
+            child = node[letter]
+            if id(child) not in ids:
+                ids[id(child)] = len(nodes)
+                nodes.append(child)
+            targets.append(ids[id(child)])
+            letters.append(letter)
+        edges.append(len(targets))
+
+    header = HEADER.pack(
+        MAGIC, FORMAT,
+        source_stat.st_mtime_ns, source_stat.st_size,
+        len(nodes), len(targets), len(dawg)
+    )
+
+    fd, temp = tempfile.mkstemp(dir=path.dirname(path.abspath(filename)))
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.write(array("I", edges).tobytes())
+            file.write(array("I", targets).tobytes())
+            file.write(bytes(FINAL in node for node in nodes))
+            file.write("".join(letters).encode("latin-1"))
+        os.chmod(temp, 0o644)
+        os.replace(temp, filename)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+def is_current(filename: str, source_stat: os.stat_result) -> bool:
+    """Whether *filename* is a compiled DAWG of the source file as it is now."""
+
+    try:
+        with open(filename, "rb") as file:
+            header = file.read(HEADER.size)
+        magic, fmt, mtime, size, _, _, _ = HEADER.unpack(header)
+    except (OSError, struct.error):
+        return False
+
+    return (
+        magic == MAGIC and fmt == FORMAT and
+        mtime == source_stat.st_mtime_ns and size == source_stat.st_size
+    )
+
+def load_dawg(dict_path: str, cache_path: Optional[str] = None) -> Union[Dawg, CompiledDawg]:
+    """Loads a dictionary file of one word per line as a DAWG.
+
+    The DAWG is compiled to *cache_path* (by default, the dictionary's path
+    with a ``.dawg`` extension) the first time, and recompiled only when the
+    dictionary changes; afterwards, loading only maps the compiled file.
+    If the compiled file can't be written, an in-memory `Dawg` is returned.
+    """
+
+    if cache_path is None:
+        cache_path = path.splitext(dict_path)[0] + ".dawg"
+
+    source_stat = os.stat(dict_path)
+    if not is_current(cache_path, source_stat):
+        with open(dict_path) as dict_file:
+            dawg = Dawg(w.strip() for w in dict_file)
+
+        try:
+            compile_dawg(dawg, cache_path, source_stat)
+        except (OSError, UnicodeEncodeError):
+            return dawg
+
+    return CompiledDawg(cache_path)
@@ -0,0 +1,177 @@
+"""Global leaderboard of Boggle players' high scores."""
+
+from bisect import bisect_left, bisect_right, insort
+from threading import Lock
+from typing import *
+import atexit
+import sqlite3
+import time
+
+class Leaderboard():
+    """Every player's best score, kept sorted in memory and persisted to SQLite
+    in batches.
+
+    Ranks are found by binary search over the sorted scores, so they never
+    need a scan of every player. Each process keeps its own view, which it
+    syncs with the database at most every *sync_interval* seconds: pending
+    high scores are written out, and those written by every other process
+    sharing the database are read back in. Scores are only ever raised when
+    flushed, so processes never overwrite each other's high scores.
+
+    >>> board = Leaderboard(":memory:")
+    >>> board.submit("a", 10), board.submit("b", 30), board.submit("a", 5)
+    (True, True, False)
+    >>> board.rank("a"), board.rank("b"), board.top()
+    (2, 1, [30, 10])
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS scores (
+            player TEXT PRIMARY KEY,
+            score  INTEGER NOT NULL
+        )
+    """
+
+    def __init__(self,
+        filename: str = "leaderboard.db",
+        size: int = 10,
+        batch_size: int = 100,
+        sync_interval: Optional[float] = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Loads a leaderboard from an SQLite database.
+
+        Parameters
+        ----------
+        filename: `str` = "leaderboard.db"
+            The SQLite database to persist scores to.
+        size: `int` = 10
+            Number of scores returned by `top` by default.
+        batch_size: `int` = 100
+            Number of new high scores to hold before writing them out.
+        sync_interval: `Optional[float]` = 5.0
+            Seconds between syncs with the database; None to only write
+            scores out in batches & never read them back.
+        clock: `Callable[[], float]` = time.monotonic
+            Source of the current time, in seconds.
+        """
+
+        self.size = size
+        self.batch_size = batch_size
+        self.sync_interval = sync_interval
+        self.clock = clock
+
+        # player => best score; every best score in ascending order;
+        # high scores not yet written to the database
+        self.best: Dict[str, int] = {}
+        self.scores: List[int] = []
+        self.pending: Dict[str, int] = {}
+
+        self.lock = Lock()
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute(self.SCHEMA)
+
+        self._load()
+
+        atexit.register(self.flush)
+
+    def submit(self, player: str, score: int) -> bool:
+        """Records a player's score, returning whether it's a new high score."""
+
+        with self.lock:
+            old = self.best.get(player)
+            if old is not None:
+                if score <= old:
+                    return False
+                del self.scores[bisect_left(self.scores, old)]
+
+            insort(self.scores, score)
+            self.best[player] = score
+            self.pending[player] = score
+
+            if len(self.pending) >= self.batch_size:
+                self._flush()
+            self._sync_if_due()
+
+            return True
+
+    def score(self, player: str) -> int:
+        """Returns a player's best score, or 0 if they have none."""
+
+        self.sync_if_due()
+        return self.best.get(player, 0)
+
+    def rank(self, player: str) -> Optional[int]:
+        """Returns a player's global rank (1 being the best), if they have
+        a score; tied players share a rank."""
+
+        self.sync_if_due()
+        score = self.best.get(player)
+        if score is None:
+            return None
+
+        return len(self.scores) - bisect_right(self.scores, score) + 1
+
+    def top(self, n: Optional[int] = None) -> List[int]:
+        """Returns the best *n* scores (by default, the leaderboard's size),
+        highest first."""
+
+        self.sync_if_due()
+        n = self.size if n is None else n
+        return self.scores[:-n - 1:-1] if n > 0 else []
+
+    def __len__(self) -> int:
+        """Number of players with a score."""
+
+        self.sync_if_due()
+        return len(self.scores)
+
+    def flush(self):
+        """Writes any pending high scores to the database."""
+
+        with self.lock:
+            self._flush()
+
+    def sync_if_due(self):
+        """Syncs with the database if *sync_interval* has passed since the
+        last sync."""
+
+        if self._due():
+            with self.lock:
+                self._sync_if_due()
+
+    def _due(self) -> bool:
+        """Whether or not it's time to sync with the database."""
+
+        return self.sync_interval is not None and self.clock() - self.synced >= self.sync_interval
+
+    def _sync_if_due(self):
+        """Writes any pending high scores to the database and reads back in
+        those written by other processes, if a sync is due; the lock must
+        be held."""
+
+        if self._due():
+            self._flush()
+            self._load()
+
+    def _load(self):
+        """Reads every best score from the database; the lock must be held,
+        and no high scores may be pending."""
+
+        self.best = dict(self.connection.execute("SELECT player, score FROM scores"))
+        self.scores = sorted(self.best.values())
+        self.synced = self.clock()
+
+    def _flush(self):
+        """Writes pending high scores; the lock must be held."""
+
+        if not self.pending:
+            return
+
+        with self.connection:
+            self.connection.executemany(
+                """INSERT INTO scores VALUES (?, ?)
+                    ON CONFLICT (player) DO UPDATE SET score = MAX(score, excluded.score)""",
+                self.pending.items()
+            )
+        self.pending.clear()
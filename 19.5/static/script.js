@@ -63,6 +63,7 @@ if (timerValue > MAX_GUESS_TIME) {
             timerHandle = null;
 
             atGameEnd();
+            await verifyGuesses();
 
             await axios.post("/highscore", { "score": score })
         } else {
@@ -72,6 +73,20 @@ if (timerValue > MAX_GUESS_TIME) {
 }
 document.getElementById("board").classList.remove("hidden");
 
+/**
+ * Re-checks every guessed word with the server in a single request & recomputes the score from
+ * the words that are confirmed to be on the board.
+ */
+async function verifyGuesses() {
+    const words = Array.from(guessedWords);
+    const { data: { results }} = await axios.post("/submit/batch", { "words": words });
+
+    updateScore(words
+        .filter((word) => results[word] === RESULT_OK)
+        .reduce((total, word) => total + word.length, 0)
+    );
+}
+
 // -- GAME RESTART ---------------------------------------------------------------------------------
 
 /**
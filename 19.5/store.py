@@ -0,0 +1,186 @@
+"""Server-side storage for the state of Boggle players' games."""
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from secrets import token_urlsafe
+from threading import Lock, local
+from typing import *
+import json
+import sqlite3
+
+class GameState():
+    """State of a player's current game, along with their statistics."""
+
+    def __init__(self,
+        board: Optional[List[List[str]]] = None,
+        solution: FrozenSet[str] = frozenset(),
+        words: Optional[List[str]] = None,
+        highscore: int = 0,
+        games: int = 0
+    ):
+        """Creates a new game state.
+
+        Parameters
+        ----------
+        board: `Optional[List[List[str]]]` = None
+            The board being played; None if no game has been started.
+        solution: `FrozenSet[str]` = frozenset()
+            Every word on *board*.
+        words: `Optional[List[str]]` = None
+            Words the player has found on *board* so far.
+        highscore: `int` = 0
+            The player's highest score.
+        games: `int` = 0
+            Number of games the player has completed.
+        """
+
+        self.board = board
+        self.solution = solution
+        self.words = [] if words is None else words
+        self.highscore = highscore
+        self.games = games
+
+class GameStore(ABC):
+    """Base class for stores of game states, keyed by a short session ID."""
+
+    def new_id(self) -> str:
+        """Returns a new, random session ID."""
+
+        return token_urlsafe(12)
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[GameState]:
+        """Retrieves the game state for a session, if any."""
+
+    @abstractmethod
+    def put(self, session_id: str, state: GameState):
+        """Stores the game state for a session."""
+
+class MemoryGameStore(GameStore):
+    """In-process game store, evicting the least recently used games once full.
+
+    >>> store = MemoryGameStore(capacity=1)
+    >>> store.put("a", GameState(highscore=10))
+    >>> store.get("a").highscore
+    10
+    >>> store.put("b", GameState())
+    >>> store.get("a") is None
+    True
+    """
+
+    def __init__(self, capacity: int = 10000):
+        """Creates a store holding up to *capacity* games."""
+
+        self.capacity = capacity
+        self.states = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        """Retrieves the game state for a session, if any."""
+
+        with self.lock:
+            state = self.states.get(session_id)
+            if state is not None:
+                self.states.move_to_end(session_id)
+            return state
+
+    def put(self, session_id: str, state: GameState):
+        """Stores the game state for a session."""
+
+        with self.lock:
+            self.states[session_id] = state
+            self.states.move_to_end(session_id)
+            while len(self.states) > self.capacity:
+                self.states.popitem(last=False)
+
+class SqliteGameStore(GameStore):
+    """Game store kept in an SQLite database, shared by every process using it.
+
+    >>> store = SqliteGameStore(":memory:")
+    >>> store.put("a", GameState([["A"]], frozenset({"a"}), ["a"]))
+    >>> state = store.get("a")
+    >>> state.board, state.solution, state.words
+    ([['A']], frozenset({'a'}), ['a'])
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS games (
+            id        TEXT PRIMARY KEY,
+            board     TEXT,
+            solution  TEXT NOT NULL,
+            words     TEXT NOT NULL,
+            highscore INTEGER NOT NULL,
+            games     INTEGER NOT NULL
+        )
+    """
+
+    def __init__(self, filename: str = "games.db"):
+        """Creates a store in the SQLite database *filename*."""
+
+        self.filename = filename
+        self.local = local()
+        self.connection.execute(self.SCHEMA)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection to the database."""
+
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.filename, isolation_level=None)
+            if self.filename != ":memory:":
+                connection.execute("PRAGMA journal_mode=WAL")
+            self.local.connection = connection
+
+        return connection
+
+    def get(self, session_id: str) -> Optional[GameState]:
+        """Retrieves the game state for a session, if any."""
+
+        row = self.connection.execute(
+            "SELECT board, solution, words, highscore, games FROM games WHERE id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        board, solution, words, highscore, games = row
+        return GameState(
+            json.loads(board),
+            frozenset(solution.split("\n")) if solution else frozenset(),
+            json.loads(words),
+            highscore,
+            games
+        )
+
+    def put(self, session_id: str, state: GameState):
+        """Stores the game state for a session."""
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO games VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                session_id,
+                json.dumps(state.board),
+                "\n".join(state.solution),
+                json.dumps(state.words),
+                state.highscore,
+                state.games
+            )
+        )
+
+def make_store(url: str = "memory") -> GameStore:
+    """Creates a game store from a URL: either ``memory`` for an in-process
+    store, or ``sqlite:<filename>`` for an SQLite database.
+
+    >>> type(make_store("memory")).__name__
+    'MemoryGameStore'
+    >>> type(make_store("sqlite::memory:")).__name__
+    'SqliteGameStore'
+    """
+
+    if url == "memory":
+        return MemoryGameStore()
+    elif url.startswith("sqlite:"):
+        return SqliteGameStore(url[len("sqlite:"):])
+
+    raise ValueError(f"unknown game store {url}")
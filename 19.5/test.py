@@ -1,7 +1,26 @@
+import os
+
+# keep the games & leaderboard of test runs out of the real ones
+os.environ['BOGGLE_STORE'] = "memory"
+os.environ['BOGGLE_LEADERBOARD'] = ":memory:"
+
 from unittest import TestCase
-from app import app
+from app import app, boggle, games
 from flask import session
 from boggle import Boggle
+from dawg import CompiledDawg, load_dawg
+from leaderboard import Leaderboard
+from os import path
+from store import GameState
+from tempfile import TemporaryDirectory
+from typing import *
+
+def start_game(board: List[List[str]]) -> str:
+    """Stores a new game on a given board, returning its session ID."""
+
+    session_id = games.new_id()
+    games.put(session_id, GameState(board, boggle.solutions(board)))
+    return session_id
 
 class FlaskTests(TestCase):
     """A set of tests for the Boggle game's server API."""
@@ -14,17 +33,17 @@ class FlaskTests(TestCase):
         with app.test_client() as client:
             resp = client.get("/")
             self.assertIn(resp.status_code, {200, 302})
-            prev_board = session["board"]
+            prev_board = games.get(session["id"]).board
 
             # test return to prior game
             resp = client.get("/")
             self.assertEqual(resp.status_code, 200)
-            self.assertEqual(session["board"], prev_board)
+            self.assertEqual(games.get(session["id"]).board, prev_board)
 
             # test reset/new game
             resp = client.get("/?reset=1")
             self.assertEqual(resp.status_code, 302)
-            self.assertNotEqual(session["board"], prev_board)
+            self.assertNotEqual(games.get(session["id"]).board, prev_board)
 
     def test_submit(self):
         """Tests the submit entrypoint for checking if words are
@@ -32,13 +51,13 @@ class FlaskTests(TestCase):
 
         with app.test_client() as client:
             with client.session_transaction() as change_session:
-                change_session["board"] = [
+                change_session["id"] = start_game([
                     [ 'T', 'E', 'K', 'A', 'N' ],
                     [ 'R', 'A', 'S', 'T', 'R' ],
                     [ 'X', 'M', 'T', 'C', 'E' ],
                     [ 'C', 'D', 'I', 'R', 'H' ],
                     [ 'F', 'J', 'K', 'A', 'L' ]
-                ]
+                ])
             
             # test words
             words = (
@@ -53,7 +72,36 @@ class FlaskTests(TestCase):
                 self.assertEqual(resp.status_code, 200)
                 self.assertIn("result", resp.json)
                 self.assertEqual(resp.json["result"], result)
+
+            # found words are tracked server-side
+            self.assertEqual(games.get(session["id"]).words, ["dire", "raster", "treat"])
     
+    def test_submit_batch(self):
+        """Tests the batch submit entrypoint for checking many words
+        on a session's given board in one request."""
+
+        with app.test_client() as client:
+            with client.session_transaction() as change_session:
+                change_session["id"] = start_game(BoggleTests.board)
+
+            resp = client.post("/submit/batch", json={
+                "words": ["asdaf", "common", "dire", "raster", "dire"]
+            })
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.json["results"], {
+                "asdaf":  Boggle.RESULT_NOT_WORD,
+                "common": Boggle.RESULT_NOT_ON_BOARD,
+                "dire":   Boggle.RESULT_OK,
+                "raster": Boggle.RESULT_OK
+            })
+
+            # found words are tracked server-side, as they are for /submit
+            client.post("/submit/batch", json={"words": ["treat", "dire"]})
+            self.assertEqual(games.get(session["id"]).words, ["dire", "raster", "treat"])
+
+            resp = client.post("/submit/batch", json={"words": "dire"})
+            self.assertEqual(resp.status_code, 400)
+
     def test_statistics(self):
         """Tests the highscore entrypoint for submitting scores,
         retrieving a session's highscore, and for incrementing the
@@ -62,15 +110,166 @@ class FlaskTests(TestCase):
         with app.test_client() as client:
             resp = client.get("/highscore")
             self.assertEqual(resp.json["score"], 0)
+            self.assertIsNone(resp.json["rank"])
+
+            # scores are bounded by the words found on the board (4 + 6 + 5)
+            with client.session_transaction() as change_session:
+                change_session["id"] = start_game(BoggleTests.board)
+            client.post("/submit/batch", json={"words": ["dire", "raster", "treat"]})
 
             # update score with higher value
             client.post("/highscore", json={"score": 15})
             resp = client.get("/highscore")
             self.assertEqual(resp.json["score"], 15)
-            self.assertEqual(session["games"], 1)
+            self.assertEqual(resp.json["rank"], 1)
+            self.assertIn(15, resp.json["top"])
+            self.assertEqual(games.get(session["id"]).games, 1)
 
             # attempt to update score with lower value
             client.post("/highscore", json={"score": 10})
             resp = client.get("/highscore")
             self.assertEqual(resp.json["score"], 15)
-            self.assertEqual(session["games"], 2)
+            self.assertEqual(games.get(session["id"]).games, 2)
+
+            # scores that weren't earned, or aren't whole numbers, are refused
+            for score in (16, 10**12, -1, "abc", 1.5, True):
+                resp = client.post("/highscore", json={"score": score})
+                self.assertEqual(resp.status_code, 400)
+            self.assertEqual(games.get(session["id"]).games, 2)
+            self.assertNotIn(10**12, client.get("/highscore").json["top"])
+
+            # without a score, that of the found words is posted
+            resp = client.post("/highscore", json={})
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(games.get(session["id"]).games, 3)
+
+class BoggleTests(TestCase):
+    """A set of tests for the Boggle game's solver."""
+
+    board = [
+        [ 'T', 'E', 'K', 'A', 'N' ],
+        [ 'R', 'A', 'S', 'T', 'R' ],
+        [ 'X', 'M', 'T', 'C', 'E' ],
+        [ 'C', 'D', 'I', 'R', 'H' ],
+        [ 'F', 'J', 'K', 'A', 'L' ]
+    ]
+
+    def test_solve(self):
+        """Tests that solving a board finds exactly the dictionary words
+        that can be found on the board one at a time."""
+
+        solution = boggle.solve(self.board)
+
+        self.assertTrue({"dire", "raster", "treat"} <= solution)
+        self.assertNotIn("common", solution)
+        self.assertEqual(solution, {
+            word for word in boggle.words if boggle.find(self.board, word.upper())
+        })
+
+    def test_find_large_board(self):
+        """Tests that words are found anywhere on boards larger than 5x5."""
+
+        board = [['Z'] * 15 for _ in range(15)]
+        for x, letter in enumerate("TREAT", start=10):
+            board[14][x] = letter
+
+        self.assertTrue(boggle.find(board, "TREAT"))
+        self.assertFalse(boggle.find(board, "RASTER"))
+        self.assertEqual(boggle.check_valid_word(board, "treat"), Boggle.RESULT_OK)
+
+    def test_generate_board(self):
+        """Tests that generated boards meet the requested word density."""
+
+        board, solution = boggle.generate_board(6, min_words=100, min_score=400)
+        playable = boggle.playable(solution)
+
+        self.assertEqual(len(board), 6)
+        self.assertEqual(solution, boggle.solve(board))
+        self.assertGreaterEqual(len(playable), 100)
+        self.assertGreaterEqual(boggle.score(playable), 400)
+
+    def test_solve_many(self):
+        """Tests that boards solved by worker processes are solved
+        correctly & streamed back in order."""
+
+        boards = [boggle.make_board(size) for size in (5, 4, 6, 5)]
+        self.assertEqual(
+            list(boggle.solve_many(iter(boards), processes=2, chunksize=1)),
+            [boggle.solve(board) for board in boards]
+        )
+
+class DawgTests(TestCase):
+    """A set of tests for the compiled dictionary cache."""
+
+    def test_compile(self):
+        """Tests that a dictionary is compiled once, mapped afterwards
+        and recompiled when the dictionary changes."""
+
+        with TemporaryDirectory() as directory:
+            dict_path = path.join(directory, "words.txt")
+            with open(dict_path, "w") as dict_file:
+                dict_file.write("cat\ncats\ndog\n")
+
+            dawg = load_dawg(dict_path)
+            self.assertIsInstance(dawg, CompiledDawg)
+            self.assertTrue(path.exists(path.join(directory, "words.dawg")))
+            self.assertEqual(list(dawg), ["cat", "cats", "dog"])
+            self.assertNotIn("ca", dawg)
+
+            with open(dict_path, "a") as dict_file:
+                dict_file.write("dogs\n")
+
+            dawg = load_dawg(dict_path)
+            self.assertIn("dogs", dawg)
+            self.assertEqual(len(dawg), 4)
+
+class LeaderboardTests(TestCase):
+    """A set of tests for the global leaderboard."""
+
+    def test_flush(self):
+        """Tests that high scores are ranked as they come in, written out
+        in batches and ranked the same once reloaded."""
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "leaderboard.db")
+            board = Leaderboard(filename, batch_size=3)
+
+            for player, score in (("a", 10), ("b", 20), ("a", 5), ("c", 20)):
+                board.submit(player, score)
+            self.assertEqual([board.rank(p) for p in "abc"], [3, 1, 1])
+            self.assertEqual(board.top(2), [20, 20])
+
+            # only a full batch has been written so far
+            self.assertEqual(len(Leaderboard(filename)), 3)
+            board.submit("d", 30)
+            self.assertEqual(len(Leaderboard(filename)), 3)
+            board.flush()
+
+            board = Leaderboard(filename)
+            self.assertEqual([board.rank(p) for p in "abcd"], [4, 2, 2, 1])
+
+    def test_sync(self):
+        """Tests that leaderboards sharing a database see each other's
+        high scores once they sync."""
+
+        with TemporaryDirectory() as directory:
+            filename = path.join(directory, "leaderboard.db")
+            now = [0.0]
+            first = Leaderboard(filename, sync_interval=5.0, clock=lambda: now[0])
+            second = Leaderboard(filename, sync_interval=5.0, clock=lambda: now[0])
+
+            first.submit("a", 10)
+            second.submit("b", 20)
+            self.assertEqual((first.rank("a"), second.rank("b")), (1, 1))
+            self.assertIsNone(second.rank("a"))
+
+            # the first to sync writes its score out, the second reads it back
+            now[0] = 5.0
+            self.assertEqual(first.top(), [10])
+            self.assertEqual(second.top(), [20, 10])
+            self.assertEqual(second.rank("a"), 2)
+            self.assertEqual(first.top(), [10])
+
+            now[0] = 10.0
+            self.assertEqual(first.top(), [20, 10])
+            self.assertEqual(first.rank("a"), 2)
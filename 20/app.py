@@ -1,8 +1,15 @@
 from flaskkey import get_key
-from convert import codes, currency_convert, Decimal
+from convert import convert_batch, currency_convert, rate_history, Decimal
+from currencies import currencies, get_symbol
+from datetime import date
+from errors import *
 from typing import *
+import csv
+import hashlib
+import io
+import math
 
-from flask import Flask, flash, get_flashed_messages, jsonify, make_response, redirect, render_template, request
+from flask import Flask, flash, get_flashed_messages, json, jsonify, make_response, redirect, render_template, request
 from flask_accept import accept
 
 app = Flask(__name__)
@@ -29,13 +36,14 @@ def convert():
     value = currency_convert(
         request.values.get('from'),
         request.values.get('to'),
-        amount
+        amount,
+        request.values.get('date') or None
     )
 
     if isinstance(value, Decimal):
         c_from = request.values.get('from')
         c_to   = request.values.get('to')
-        flash(f'{codes.get_symbol(c_from)}{round(amount, 2)} => {codes.get_symbol(c_to)}{round(value, 2)}', "value")
+        flash(f'{get_symbol(c_from)}{round(amount, 2)} => {get_symbol(c_to)}{round(value, 2)}', "value")
     else:
         for error in value:
             flash(error, "error")
@@ -63,7 +71,7 @@ def json_convert_entry(values: Mapping[str, str]):
     except:
         pass
 
-    value = currency_convert(values.get('from'), values.get('to'),amount)
+    value = currency_convert(values.get('from'), values.get('to'), amount, values.get('date') or None)
 
     response = None
     if isinstance(value, Decimal):
@@ -85,5 +93,153 @@ def post_json():
     
     return json_convert_entry(request.json)
 
+# most conversions accepted in one batch request
+MAX_BATCH = 10000
+
+def read_batch() -> Optional[List[Mapping[str, Any]]]:
+    """Reads the conversions of a batch request: a JSON array of objects
+    (or an object with a "conversions" array), or a CSV file with a header
+    row, either uploaded as the form field "file" or sent as the body.
+
+    Returns
+    -------
+    `Optional[List[Mapping[str, Any]]]`
+        Every conversion's values, or None if the request is malformed.
+    """
+
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        data = upload.read() if upload else request.get_data()
+        try:
+            return list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))))
+        except (UnicodeDecodeError, csv.Error):
+            return None
+
+    # JSON numbers are read as Decimals, keeping the precision of amounts
+    try:
+        batch = json.loads(request.get_data(as_text=True), parse_float=Decimal)
+    except ValueError:
+        return None
+
+    if isinstance(batch, dict):
+        batch = batch.get('conversions')
+    if not isinstance(batch, list) or not all(isinstance(v, dict) for v in batch):
+        return None
+
+    return batch
+
+@app.route("/batch", methods=["POST"])
+def batch_convert():
+    """Converts a batch of from/to/amount triples in one request, responding
+    with the result of each in order."""
+
+    batch = read_batch()
+    if batch is None:
+        return make_response(jsonify({
+            "type": "error",
+            "errors": ["Expected an array of conversions or a CSV file"]
+        }), 400)
+    if len(batch) > MAX_BATCH:
+        return make_response(jsonify({
+            "type": "error",
+            "errors": [f"At most {MAX_BATCH} conversions can be made at once"]
+        }), 413)
+
+    conversions = []
+    for values in batch:
+        amount = values.get('amount')
+        try:
+            amount = Decimal(amount)
+        except:
+            pass
+
+        conversions.append((values.get('from'), values.get('to'), amount, values.get('date') or None))
+
+    results = []
+    for value in convert_batch(conversions):
+        if isinstance(value, Decimal):
+            results.append({ "type": "success", "value": value })
+        else:
+            results.append({ "type": "error", "errors": value })
+
+    return jsonify({ "type": "success", "results": results })
+
+@app.route("/history", methods=["GET"])
+def rates_history():
+    """Responds with the daily rates from one currency to others (by default,
+    every currency) over a range of dates, for reporting.
+
+    Takes the query parameters "from", "to" (a comma-separated list of codes),
+    "start" & "end" (inclusive ISO 8601 dates). Rates are listed per currency,
+    in the order of "dates"; null where a currency had no rate that day. Responds
+    with a 404 error if no rate history has been built.
+    """
+
+    errs = []
+
+    c_from = request.values.get('from')
+    if c_from is None:
+        errs.append(missing_argument_error("from"))
+    else:
+        c_from = c_from.upper()
+
+    span = []
+    for argname in ('start', 'end'):
+        value = request.values.get(argname)
+        if value is None:
+            errs.append(missing_argument_error(argname))
+            continue
+        try:
+            span.append(date.fromisoformat(value))
+        except ValueError:
+            errs.append(invalid_date_error(argname))
+
+    # currency codes can only be checked against an existing history
+    history = rate_history()
+    if history is not None:
+        c_to = request.values.get('to')
+        c_to = list(history.index) if c_to is None else [c.strip().upper() for c in c_to.split(',') if c.strip()]
+        for code in ([c_from] if c_from is not None else []) + c_to:
+            if code not in history.index:
+                errs.append(invalid_currency_code_error(code))
+
+    if len(errs) > 0:
+        return make_response(jsonify({ "type": "error", "errors": errs }), 400)
+    if history is None:
+        return make_response(jsonify({ "type": "error", "errors": [no_history_error()] }), 404)
+
+    dates, rates = history.range(c_from, c_to, *span)
+    return jsonify({
+        "type": "success",
+        "from": c_from,
+        "dates": [d.isoformat() for d in dates],
+        "rates": {
+            code: [None if math.isnan(r) else r for r in values.tolist()]
+            for code, values in rates.items()
+        }
+    })
+
+# seconds clients may reuse the currency table before checking it again
+CURRENCIES_MAX_AGE = 86400
+
+# the currency table never changes while running, so its response body is
+# built once & tagged with a hash of itself
+CURRENCIES_JSON = json.dumps({
+    "type": "success",
+    "currencies": [currency._asdict() for currency in currencies.values()]
+})
+CURRENCIES_ETAG = hashlib.sha1(CURRENCIES_JSON.encode("utf-8")).hexdigest()
+
+@app.route("/currencies", methods=["GET"])
+def currency_table():
+    """Responds with the code, symbol & name of every currency, cacheable by
+    clients and revalidated by ETag."""
+
+    response = app.response_class(CURRENCIES_JSON, mimetype="application/json")
+    response.set_etag(CURRENCIES_ETAG)
+    response.cache_control.public = True
+    response.cache_control.max_age = CURRENCIES_MAX_AGE
+    return response.make_conditional(request)
+
 if __name__ == "__main__":
     app.run()
@@ -0,0 +1,168 @@
+"""Asynchronous (ASGI) variant of the Currency Exchange server.
+
+Serve with any ASGI server, e.g. ``uvicorn asgi:app``. The Flask routes are
+run as they are in a thread pool, but the rates they need are fetched on
+the event loop beforehand, so concurrent requests missing the same rates
+wait on a single upstream fetch instead of each blocking a thread on one.
+"""
+
+from app import app as flask_app
+from concurrent.futures import Executor
+from convert import RATE_BASE, rates
+from rates import AsyncRateCache
+from typing import *
+import asyncio
+import io
+import sys
+
+# paths whose routes convert at the latest rates
+RATE_PATHS = frozenset({"/", "/batch"})
+
+class AsgiAdapter():
+    """Serves a WSGI application over ASGI, running it in a thread pool.
+
+    Each request's body is read in full before the application is called,
+    and its response is sent once the application has produced all of it.
+    """
+
+    def __init__(self,
+        wsgi_app: Callable,
+        prepare: Optional[Callable[[Mapping[str, Any]], Awaitable[None]]] = None,
+        executor: Optional[Executor] = None
+    ):
+        """Creates an ASGI application serving a WSGI application.
+
+        Parameters
+        ----------
+        wsgi_app: `Callable`
+            The WSGI application to serve.
+        prepare: `Optional[Callable[[Mapping[str, Any]], Awaitable[None]]]` = None
+            Awaited with the scope of every HTTP request (and with None on
+            startup) before *wsgi_app* is called.
+        executor: `Optional[Executor]` = None
+            Thread pool to call *wsgi_app* in; by default, the event loop's
+            default executor.
+        """
+
+        self.wsgi_app = wsgi_app
+        self.prepare = prepare
+        self.executor = executor
+
+    async def __call__(self, scope: Mapping[str, Any], receive: Callable, send: Callable):
+        """ASGI entrypoint."""
+
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(f"unsupported ASGI scope type {scope['type']}")
+
+    async def lifespan(self, receive: Callable, send: Callable):
+        """Handles server startup & shutdown."""
+
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if self.prepare is not None:
+                    await self.prepare(None)
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope: Mapping[str, Any], receive: Callable, send: Callable):
+        """Handles an HTTP request."""
+
+        body = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+
+        if self.prepare is not None:
+            await self.prepare(scope)
+
+        environ = self.environ(scope, b"".join(body))
+        loop = asyncio.get_running_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self.call, environ)
+
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": content})
+
+    def call(self, environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+        """Calls the WSGI application, returning its status, headers & body."""
+
+        response = []
+
+        def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+            response[:] = [status, headers]
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            content = b"".join(result)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+        status, headers = response
+        return (
+            int(status.split(" ", 1)[0]),
+            [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers],
+            content
+        )
+
+    def environ(self, scope: Mapping[str, Any], body: bytes) -> Dict[str, Any]:
+        """Builds the WSGI environment of an HTTP request."""
+
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+            "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "CONTENT_LENGTH": str(len(body)),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False
+        }
+
+        for name, value in scope.get("headers", ()):
+            name = name.decode("latin-1").upper().replace("-", "_")
+            value = value.decode("latin-1")
+            if name == "CONTENT_TYPE":
+                environ["CONTENT_TYPE"] = value
+            elif name != "CONTENT_LENGTH":
+                key = f"HTTP_{name}"
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+
+        return environ
+
+async_rates = AsyncRateCache(rates)
+
+async def fetch_rates(scope: Optional[Mapping[str, Any]]):
+    """Makes sure the latest rates are cached before they're needed; a failed
+    fetch is left for the route to report."""
+
+    if scope is not None and scope["path"] not in RATE_PATHS:
+        return
+
+    try:
+        await async_rates.get_rates(RATE_BASE)
+    except Exception:
+        pass
+
+app = AsgiAdapter(flask_app.wsgi_app, fetch_rates)
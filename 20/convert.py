@@ -1,12 +1,43 @@
-from forex_python.converter import CurrencyCodes, CurrencyRates
+from datetime import date
 from decimal import Decimal
 from typing import *
 from errors import *
+from history import RateHistory, load_history
+from providers import make_provider
+from rates import RateCache, RateMatrix
+import math
+import os
 
-rates = CurrencyRates()
-codes = CurrencyCodes()
+# seconds conversion rates are served from memory before being refreshed;
+# currency whose rate table every cross rate is derived from
+RATE_TTL = 3600.0
+RATE_BASE = "EUR"
 
-def currency_convert(c_from: str, c_to: str, amount: Union[float, Decimal]) -> Union[Union[float, Decimal], Container[str]]:
+# where rates come from: "forex" to fetch them over the network, or
+# "snapshot:<filename>" to read them from a local snapshot file
+provider = make_provider(os.environ.get("FOREX_RATES", "forex"))
+
+rates = RateCache(provider.get_rates, ttl=RATE_TTL)
+matrix = RateMatrix(rates, RATE_BASE)
+
+# daily rates for conversions at past dates, built by history.py
+HISTORY_FILE = os.environ.get("FOREX_HISTORY", "rates.history")
+history: Optional[RateHistory] = None
+
+def rate_history() -> Optional[RateHistory]:
+    """Returns the current rate history, remapping the history file if it
+    has changed; None if there is none."""
+
+    global history
+    history = load_history(HISTORY_FILE, history)
+    return history
+
+def currency_convert(
+    c_from: str,
+    c_to: str,
+    amount: Union[float, Decimal],
+    date_obj: Optional[Union[date, str]] = None
+) -> Union[Union[float, Decimal], Container[str]]:
     """Converts between one currency to another.
 
     >>> currency_convert("USD", "USD", 1.0)
@@ -20,6 +51,9 @@ def currency_convert(c_from: str, c_to: str, amount: Union[float, Decimal]) -> U
         Currency code you are converting to.
     amount: `Union[float, Decimal]`
         Numeric amount of *c_from* you are converting.
+    date_obj: `Optional[Union[date, str]]` = None
+        Date (or ISO 8601 date string) whose rates to convert at, from the
+        rate history; by default, the latest rates.
     
     Returns
     -------
@@ -29,35 +63,111 @@ def currency_convert(c_from: str, c_to: str, amount: Union[float, Decimal]) -> U
         Container of strings with errors if erroneous inputs are received.
     """
 
-    errs = []
-
-    if c_from is None:
-        errs.append(missing_argument_error("from"))
-    if c_to is None:
-        errs.append(missing_argument_error("to"))
-    if amount is None:
-        errs.append(missing_argument_error("amount"))
-    elif not isinstance(amount, (float, Decimal)):
-        errs.append(not_a_number_error("amount"))
-
-    if c_from is not None and c_to is not None:
-        c_from = c_from.upper()
-        c_to   = c_to.upper()
-        
-        cur_rates = None
+    return convert_batch([(c_from, c_to, amount, date_obj)])[0]
+
+def convert_batch(conversions: Iterable[Tuple[Optional[str], Optional[str], Any, Optional[Union[date, str]]]]) -> List[Union[Union[float, Decimal], Container[str]]]:
+    """Converts a batch of amounts between currencies, looking up every rate
+    at once: latest rates from the cross-rate matrix, and rates at past dates
+    from the rate history.
+
+    Parameters
+    ----------
+    conversions: `Iterable[Tuple[Optional[str], Optional[str], Any, Optional[Union[date, str]]]]`
+        (from, to, amount, date) tuples, as taken by `currency_convert`.
+
+    Returns
+    -------
+    `List[Union[Union[float, Decimal], Container[str]]]`
+        The result of each conversion, in order: either the converted amount
+        or a container of strings with errors.
+    """
+
+    conversions = list(conversions)
+
+    index = {}
+    if any(c[3] is None for c in conversions):
         try:
-            cur_rates = rates.get_rates(c_from)
-            if c_to not in cur_rates:
-                errs.append(invalid_currency_code_error(c_to))
+            index, cross_rates = matrix.table()
         except:
+            pass
+
+    past = None
+    if any(c[3] is not None for c in conversions):
+        past = rate_history()
+
+    results = []
+    latest, rows, cols = [], [], []
+    dated, dated_from, dated_to, dates = [], [], [], []
+    for c_from, c_to, amount, date_obj in conversions:
+        errs = []
+
+        if c_from is None:
+            errs.append(missing_argument_error("from"))
+        elif not isinstance(c_from, str):
             errs.append(invalid_currency_code_error(c_from))
+        if c_to is None:
+            errs.append(missing_argument_error("to"))
+        elif not isinstance(c_to, str):
+            errs.append(invalid_currency_code_error(c_to))
+        if amount is None:
+            errs.append(missing_argument_error("amount"))
+        elif not isinstance(amount, (float, Decimal)):
+            errs.append(not_a_number_error("amount"))
 
-            try:
-                rates.get_rates(c_to)
-            except:
-                errs.append(invalid_currency_code_error(c_to))
-    
-    if len(errs) > 0:
-        return tuple(errs)
-    
-    return type(amount)(cur_rates[c_to]) * amount
+        known = index
+        if date_obj is not None:
+            known = {} if past is None else past.index
+            if not isinstance(date_obj, date):
+                try:
+                    date_obj = date.fromisoformat(date_obj)
+                except (TypeError, ValueError):
+                    errs.append(invalid_date_error("date"))
+
+        if isinstance(c_from, str) and isinstance(c_to, str):
+            c_from = c_from.upper()
+            c_to   = c_to.upper()
+
+            if date_obj is not None and past is None:
+                if isinstance(date_obj, date):
+                    errs.append(no_rates_error(c_from, c_to, date_obj.isoformat()))
+            else:
+                if c_from not in known:
+                    errs.append(invalid_currency_code_error(c_from))
+                if c_to not in known:
+                    errs.append(invalid_currency_code_error(c_to))
+
+        if len(errs) > 0:
+            results.append(tuple(errs))
+        elif date_obj is None:
+            latest.append(len(results))
+            rows.append(index[c_from])
+            cols.append(index[c_to])
+            results.append(amount)
+        else:
+            dated.append(len(results))
+            dated_from.append(c_from)
+            dated_to.append(c_to)
+            dates.append(date_obj)
+            results.append(amount)
+
+    # amounts are multiplied one by one to keep the precision of Decimals,
+    # whose latest rates are divided out of the base table's quoted rates
+    # (the matrix's row of the base currency) rather than taken as floats
+    if len(latest) > 0:
+        quoted = cross_rates[index[RATE_BASE]].tolist()
+        for i, row, col, rate in zip(latest, rows, cols, cross_rates[rows, cols].tolist()):
+            if isinstance(results[i], Decimal):
+                rate = Decimal(repr(quoted[col])) / Decimal(repr(quoted[row]))
+            results[i] = type(results[i])(rate) * results[i]
+
+    if len(dated) > 0:
+        found = past.rates_many(dated_from, dated_to, dates).tolist()
+        for i, c_from, c_to, date_obj, rate in zip(dated, dated_from, dated_to, dates, found):
+            if math.isnan(rate):
+                results[i] = (no_rates_error(c_from, c_to, date_obj.isoformat()),)
+            elif isinstance(results[i], Decimal):
+                results[i] = Decimal(repr(rate)) * results[i]
+            else:
+                results[i] = rate * results[i]
+
+    return results
@@ -0,0 +1,47 @@
+"""Table of currency codes, symbols & names, loaded once at startup."""
+
+from os import path
+from types import MappingProxyType
+from typing import *
+import forex_python
+import json
+
+class Currency(NamedTuple):
+    """A currency's ISO 4217 code, symbol & name."""
+
+    code: str
+    symbol: str
+    name: str
+
+# currency table bundled with forex_python
+CURRENCIES_FILE = path.join(path.dirname(path.abspath(forex_python.__file__)), "raw_data", "currencies.json")
+
+def load_currencies(filename: str = CURRENCIES_FILE) -> Mapping[str, Currency]:
+    """Loads a JSON table of currencies (objects with "cc", "symbol" & "name"
+    keys) into a read-only mapping of currency codes to currencies, sorted
+    by code.
+
+    >>> load_currencies()["USD"]
+    Currency(code='USD', symbol='US$', name='United States dollar')
+    """
+
+    with open(filename, encoding="utf-8") as file:
+        entries = json.load(file)
+
+    return MappingProxyType({
+        entry["cc"]: Currency(entry["cc"], entry["symbol"], entry["name"])
+        for entry in sorted(entries, key=lambda entry: entry["cc"])
+    })
+
+currencies = load_currencies()
+
+def get_symbol(code: str) -> str:
+    """Returns the symbol of the currency *code*, or an empty string if it
+    isn't known.
+
+    >>> get_symbol("gbp"), get_symbol("XXD")
+    ('£', '')
+    """
+
+    currency = currencies.get(code.upper())
+    return "" if currency is None else currency.symbol
@@ -12,3 +12,18 @@ def invalid_currency_code_error(code: str) -> str:
     """Formats an error for an invalid currency code."""
     
     return f'Invalid currency code {code}'
+
+def invalid_date_error(argname: str) -> str:
+    """Formats an error for when a given parameter is not a date."""
+
+    return f'"{argname}" is not a date (YYYY-MM-DD)'
+
+def no_rates_error(c_from: str, c_to: str, date: str) -> str:
+    """Formats an error for a conversion with no exchange rate on a date."""
+
+    return f'No exchange rate from {c_from} to {c_to} on {date}'
+
+def no_history_error() -> str:
+    """Formats an error for when there is no rate history to look rates up in."""
+
+    return 'No rate history available'
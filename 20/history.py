@@ -0,0 +1,214 @@
+"""Local store of daily exchange rates, for conversions at past dates."""
+
+from datetime import date
+from mmap import ACCESS_READ, mmap
+from os import path
+from typing import *
+import argparse
+import numpy as np
+import os
+import struct
+import tempfile
+
+from providers import Record, read_snapshot
+
+# Header of a history file: magic, format version, base currency, and day &
+# currency counts. Tables are in native byte order, like compiled DAWGs.
+HEADER = struct.Struct("=4sI8sII")
+MAGIC = b"RATE"
+FORMAT = 1
+
+# bytes taken by each currency code
+CODE_SIZE = 8
+
+class RateHistory():
+    """Daily exchange rates stored column by column in a memory-mapped file.
+
+    The file holds a header, the code of every currency, the ascending days
+    with rates (as ordinals) and then one column per currency: its value in
+    the base currency on each day, NaN where it had none. Rates on a date are
+    found by binary search over the days, and those over a range of dates
+    are slices of the columns, so nothing is read until it's needed.
+    """
+
+    def __init__(self, filename: str):
+        """Maps a history file written by `write_history`."""
+
+        with open(filename, "rb") as file:
+            stat = os.fstat(file.fileno())
+            self.map = mmap(file.fileno(), 0, access=ACCESS_READ)
+
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+
+        magic, fmt, base, days, currencies = HEADER.unpack_from(self.map)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f"{filename} is not a rate history")
+
+        self.base = base.rstrip(b"\0").decode("ascii")
+
+        offset = HEADER.size
+        self.codes = [
+            self.map[offset + i * CODE_SIZE:offset + (i + 1) * CODE_SIZE].rstrip(b"\0").decode("ascii")
+            for i in range(currencies)
+        ]
+        self.index = {code: i for i, code in enumerate(self.codes)}
+        offset += CODE_SIZE * currencies
+
+        self.days = np.frombuffer(self.map, dtype=np.int32, count=days, offset=offset)
+        offset += _aligned(4 * days)
+        self.columns = np.frombuffer(
+            self.map, dtype=np.float64, count=days * currencies, offset=offset
+        ).reshape(currencies, days)
+
+    def __len__(self) -> int:
+        """Number of days with rates."""
+
+        return len(self.days)
+
+    @property
+    def span(self) -> Optional[Tuple[date, date]]:
+        """The first & last days with rates, if any."""
+
+        if len(self.days) == 0:
+            return None
+        return date.fromordinal(int(self.days[0])), date.fromordinal(int(self.days[-1]))
+
+    def rate(self, c_from: str, c_to: str, date_obj: date) -> float:
+        """Returns the value of one unit of *c_from* in *c_to* as of the
+        latest day with rates on or before *date_obj*; NaN if either
+        currency had no rate then.
+
+        Raises
+        ------
+        `KeyError`
+            If either currency code is unknown.
+        """
+
+        return float(self.rates_many([c_from], [c_to], [date_obj])[0])
+
+    def rates_many(self,
+        c_from: Sequence[str],
+        c_to: Sequence[str],
+        dates: Sequence[date]
+    ) -> np.ndarray:
+        """Returns the value of one unit of each of *c_from* in the matching
+        currency of *c_to*, as of the matching date of *dates*; NaN where
+        there's no rate.
+
+        Raises
+        ------
+        `KeyError`
+            If any currency code is unknown.
+        """
+
+        rows = np.fromiter((self.index[c] for c in c_from), dtype=np.intp, count=len(c_from))
+        cols = np.fromiter((self.index[c] for c in c_to), dtype=np.intp, count=len(c_to))
+        ordinals = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+        if len(self.days) == 0:
+            return np.full(len(ordinals), np.nan)
+
+        # latest day on or before each date; dates before the first day have none
+        days = np.searchsorted(self.days, ordinals, side="right") - 1
+        known = days >= 0
+        days = np.maximum(days, 0)
+
+        with np.errstate(invalid="ignore"):
+            rates = self.columns[cols, days] / self.columns[rows, days]
+        return np.where(known, rates, np.nan)
+
+    def range(self,
+        c_from: str,
+        c_to: Sequence[str],
+        start: date,
+        end: date
+    ) -> Tuple[List[date], Dict[str, np.ndarray]]:
+        """Returns every day with rates from *start* to *end* (inclusive), and
+        the value of one unit of *c_from* in each of *c_to* on those days;
+        NaN where there's no rate.
+
+        Raises
+        ------
+        `KeyError`
+            If any currency code is unknown.
+        """
+
+        lo = int(np.searchsorted(self.days, start.toordinal(), side="left"))
+        hi = int(np.searchsorted(self.days, end.toordinal(), side="right"))
+
+        source = self.columns[self.index[c_from], lo:hi]
+        with np.errstate(invalid="ignore"):
+            rates = {code: self.columns[self.index[code], lo:hi] / source for code in c_to}
+
+        return [date.fromordinal(int(day)) for day in self.days[lo:hi]], rates
+
+def _aligned(size: int) -> int:
+    """Rounds *size* up to a multiple of 8 bytes."""
+
+    return (size + 7) & ~7
+
+def write_history(filename: str, records: Iterable[Record], base: str = "EUR") -> int:
+    """Writes the daily rate tables of *base* among *records* to *filename*,
+    in the format read by `RateHistory`; tables of other bases are skipped.
+
+    The file is written under a temporary name and then renamed, so processes
+    reading the history never see a partial file.
+
+    Returns
+    -------
+    `int`
+        Number of days written.
+    """
+
+    tables = {day: table for day, b, table in records if b == base}
+    days = sorted(tables)
+    codes = sorted({base}.union(*tables.values()))
+    index = {code: i for i, code in enumerate(codes)}
+
+    columns = np.full((len(codes), len(days)), np.nan)
+    columns[index[base]] = 1.0
+    for j, day in enumerate(days):
+        for code, rate in tables[day].items():
+            columns[index[code], j] = rate
+
+    header = HEADER.pack(MAGIC, FORMAT, base.encode("ascii"), len(days), len(codes))
+    ordinals = np.array([day.toordinal() for day in days], dtype=np.int32).tobytes()
+
+    fd, temp = tempfile.mkstemp(dir=path.dirname(path.abspath(filename)))
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(header)
+            file.write(b"".join(code.encode("ascii").ljust(CODE_SIZE, b"\0") for code in codes))
+            file.write(ordinals.ljust(_aligned(len(ordinals)), b"\0"))
+            file.write(columns.tobytes())
+        os.chmod(temp, 0o644)
+        os.replace(temp, filename)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+    return len(days)
+
+def load_history(filename: str, current: Optional[RateHistory] = None) -> Optional[RateHistory]:
+    """Maps the history file *filename*, or returns *current* (a previous
+    mapping of it) if the file hasn't changed since; None if there is no
+    history file."""
+
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+
+    if current is not None and current.stamp == (stat.st_mtime_ns, stat.st_size):
+        return current
+
+    return RateHistory(filename)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds a rate history from a snapshot file.")
+    parser.add_argument("history", help="history file to write")
+    parser.add_argument("snapshot", help="snapshot file to read (.json or .csv)")
+    parser.add_argument("--base", default="EUR", help="base currency of the stored rates")
+    args = parser.parse_args()
+
+    days = write_history(args.history, read_snapshot(args.snapshot), args.base)
+    print(f"wrote {days} days of {args.base} rates to {args.history}")
@@ -0,0 +1,243 @@
+"""Sources of foreign exchange rates, and snapshots of them on disk."""
+
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from datetime import date, timedelta
+from os import path
+from typing import *
+import argparse
+import csv
+import json
+import os
+import tempfile
+
+Rates = Mapping[str, float]
+
+# a base currency's rate table on a given day
+Record = Tuple[date, str, Rates]
+
+class RatesNotAvailableError(Exception):
+    """Raised when a provider has no rates for a base currency or date."""
+
+class RateProvider(ABC):
+    """Base class for sources of exchange rate tables."""
+
+    @abstractmethod
+    def get_rates(self, base: str, date_obj: Optional[date] = None) -> Rates:
+        """Returns the value of one unit of *base* in every other currency,
+        either latest or as of *date_obj*.
+
+        Raises
+        ------
+        `RatesNotAvailableError`
+            If there are no rates for *base* (as of *date_obj*).
+        """
+
+class ForexPythonProvider(RateProvider):
+    """Rates fetched over the network by forex_python."""
+
+    def __init__(self):
+        """Creates a provider fetching from forex_python's rate service."""
+
+        from forex_python.converter import CurrencyRates
+
+        self.rates = CurrencyRates()
+
+    def get_rates(self, base: str, date_obj: Optional[date] = None) -> Rates:
+        """Returns the value of one unit of *base* in every other currency,
+        either latest or as of *date_obj*."""
+
+        try:
+            return self.rates.get_rates(base, date_obj)
+        except Exception as error:
+            raise RatesNotAvailableError(str(error)) from error
+
+class SnapshotProvider(RateProvider):
+    """Rates read from a local snapshot file of dated rate tables, written by
+    `write_snapshot`; the file is reread whenever it changes.
+
+    Rates of a base currency missing from the snapshot are derived from
+    another base's table holding it, as of the same day.
+
+    >>> provider = SnapshotProvider("test_snapshot.json")
+    >>> provider.get_rates("GBP")["USD"]
+    2.5
+    """
+
+    def __init__(self, filename: str):
+        """Creates a provider reading the snapshot file *filename*."""
+
+        self.filename = filename
+        self.stamp: Optional[Tuple[int, int]] = None
+
+        # base => ascending dates, and the table of each
+        self.dates: Dict[str, List[date]] = {}
+        self.tables: Dict[str, List[Rates]] = {}
+
+    def get_rates(self, base: str, date_obj: Optional[date] = None) -> Rates:
+        """Returns the value of one unit of *base* in every other currency,
+        as of the latest day in the snapshot on or before *date_obj*."""
+
+        self.reload()
+
+        table = self._find(base, date_obj)
+        if table is not None:
+            return table
+
+        # derive from the first other base quoting this one on that day
+        for other in sorted(self.tables):
+            table = self._find(other, date_obj)
+            if table is not None and table.get(base):
+                rate = table[base]
+                derived = {code: value / rate for code, value in table.items()}
+                derived[other] = 1.0 / rate
+                derived[base] = 1.0
+                return derived
+
+        when = "latest" if date_obj is None else date_obj.isoformat()
+        raise RatesNotAvailableError(f"no {when} rates for {base} in {self.filename}")
+
+    def reload(self):
+        """Rereads the snapshot file if it changed since it was last read."""
+
+        stat = os.stat(self.filename)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self.stamp:
+            return
+
+        dates: Dict[str, List[date]] = {}
+        tables: Dict[str, List[Rates]] = {}
+        for day, base, table in sorted(read_snapshot(self.filename), key=lambda r: (r[1], r[0])):
+            dates.setdefault(base, []).append(day)
+            tables.setdefault(base, []).append(table)
+
+        self.dates, self.tables, self.stamp = dates, tables, stamp
+
+    def _find(self, base: str, date_obj: Optional[date]) -> Optional[Rates]:
+        """Returns *base*'s latest table on or before *date_obj*, if any."""
+
+        dates = self.dates.get(base)
+        if not dates:
+            return None
+
+        i = len(dates) if date_obj is None else bisect_right(dates, date_obj)
+        return self.tables[base][i - 1] if i > 0 else None
+
+def read_snapshot(filename: str) -> List[Record]:
+    """Reads the dated rate tables of a snapshot file.
+
+    A ``.csv`` file has a header row and one ``date,base,currency,rate`` row
+    per rate. Any other file is JSON: an array of objects of the form
+    ``{"date": "2020-10-01", "base": "EUR", "rates": {"USD": 1.17}}``.
+    """
+
+    records: Dict[Tuple[date, str], Dict[str, float]] = {}
+
+    if filename.endswith(".csv"):
+        with open(filename, newline="") as file:
+            for row in csv.DictReader(file):
+                key = (date.fromisoformat(row["date"]), row["base"])
+                records.setdefault(key, {})[row["currency"]] = float(row["rate"])
+    else:
+        with open(filename) as file:
+            for entry in json.load(file):
+                key = (date.fromisoformat(entry["date"]), entry["base"])
+                records.setdefault(key, {}).update(
+                    (code, float(rate)) for code, rate in entry["rates"].items()
+                )
+
+    return [(day, base, table) for (day, base), table in records.items()]
+
+def write_snapshot(filename: str, records: Iterable[Record]):
+    """Writes dated rate tables to a snapshot file, in the format read by
+    `read_snapshot`.
+
+    The file is written under a temporary name and then renamed, so readers
+    never see a partial snapshot.
+    """
+
+    records = sorted(records, key=lambda r: (r[0], r[1]))
+
+    fd, temp = tempfile.mkstemp(dir=path.dirname(path.abspath(filename)))
+    try:
+        with os.fdopen(fd, "w", newline="") as file:
+            if filename.endswith(".csv"):
+                writer = csv.writer(file)
+                writer.writerow(("date", "base", "currency", "rate"))
+                for day, base, table in records:
+                    for code in sorted(table):
+                        writer.writerow((day.isoformat(), base, code, table[code]))
+            else:
+                json.dump([
+                    {"date": day.isoformat(), "base": base, "rates": dict(sorted(table.items()))}
+                    for day, base, table in records
+                ], file, indent=1)
+        os.chmod(temp, 0o644)
+        os.replace(temp, filename)
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+def refresh_snapshot(
+    filename: str,
+    provider: RateProvider,
+    base: str = "EUR",
+    days: int = 1,
+    today: Optional[date] = None
+) -> int:
+    """Fetches *base*'s rate tables for the last *days* days from *provider*
+    into a snapshot file, keeping every other table already in it. The file
+    is left as it is if nothing could be fetched.
+
+    Returns
+    -------
+    `int`
+        Number of tables fetched.
+    """
+
+    today = date.today() if today is None else today
+
+    records = {}
+    if path.exists(filename):
+        records = {(day, b): table for day, b, table in read_snapshot(filename)}
+
+    fetched = 0
+    for n in range(days):
+        day = today - timedelta(days=n)
+        try:
+            records[(day, base)] = provider.get_rates(base, None if n == 0 else day)
+        except RatesNotAvailableError:
+            continue
+        fetched += 1
+
+    if fetched > 0:
+        write_snapshot(filename, [(day, b, table) for (day, b), table in records.items()])
+    return fetched
+
+def make_provider(url: str = "forex") -> RateProvider:
+    """Creates a rate provider from a URL: either ``forex`` for rates fetched
+    by forex_python, or ``snapshot:<filename>`` for a snapshot file.
+
+    >>> type(make_provider("snapshot:test_snapshot.json")).__name__
+    'SnapshotProvider'
+    """
+
+    if url == "forex":
+        return ForexPythonProvider()
+    elif url.startswith("snapshot:"):
+        return SnapshotProvider(url[len("snapshot:"):])
+
+    raise ValueError(f"unknown rate provider {url}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refreshes a snapshot file of exchange rates.")
+    parser.add_argument("snapshot", help="snapshot file to update (.json or .csv)")
+    parser.add_argument("--source", default="forex", help="provider to fetch rates from")
+    parser.add_argument("--base", default="EUR", help="base currency of the fetched tables")
+    parser.add_argument("--days", type=int, default=1, help="number of days back to fetch")
+    args = parser.parse_args()
+
+    fetched = refresh_snapshot(args.snapshot, make_provider(args.source), args.base, args.days)
+    print(f"fetched {fetched} of {args.days} {args.base} rate tables into {args.snapshot}")
+    if fetched == 0:
+        raise SystemExit(1)
@@ -0,0 +1,273 @@
+"""Caching of foreign exchange rates fetched from an upstream source."""
+
+from concurrent.futures import Executor
+from threading import Lock, Thread
+from typing import *
+import asyncio
+import numpy as np
+import time
+
+Rates = Mapping[str, float]
+
+class RateCache():
+    """In-process cache of exchange rate tables, keyed by base currency.
+
+    Tables younger than *ttl* seconds are served from memory. Older tables
+    are still served from memory, but trigger a refresh in the background, so
+    only the first lookup of a base currency waits on the upstream source.
+    A table older than *max_age* seconds is refetched before being served.
+
+    >>> fetches = []
+    >>> cache = RateCache(lambda base: fetches.append(base) or {base: 1.0})
+    >>> cache.get_rates("USD"), cache.get_rates("USD"), fetches
+    ({'USD': 1.0}, {'USD': 1.0}, ['USD'])
+    """
+
+    def __init__(self,
+        fetch: Callable[[str], Rates],
+        ttl: float = 3600.0,
+        max_age: Optional[float] = 86400.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """Creates an empty rate cache.
+
+        Parameters
+        ----------
+        fetch: `Callable[[str], Rates]`
+            Fetches the rate table for a base currency from upstream, raising
+            if the base currency isn't known.
+        ttl: `float` = 3600.0
+            Seconds a table is served before being refreshed.
+        max_age: `Optional[float]` = 86400.0
+            Seconds a stale table may still be served while it's refreshed;
+            None to serve stale tables for as long as refreshes fail.
+        clock: `Callable[[], float]` = time.monotonic
+            Source of the current time, in seconds.
+        """
+
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_age = max_age
+        self.clock = clock
+
+        # base => (time fetched, rate table); bases being refreshed;
+        # base => lock held while it's fetched in the foreground
+        self.tables: Dict[str, Tuple[float, Rates]] = {}
+        self.refreshing: Set[str] = set()
+        self.fetching: Dict[str, Lock] = {}
+        self.lock = Lock()
+
+    def get_rates(self, base: str) -> Rates:
+        """Returns the rate table of a base currency, fetching it if it isn't
+        cached (or is too old to be served). Threads missing the same base
+        at once wait on a single fetch."""
+
+        table = self.peek(base)
+        if table is not None:
+            return table
+
+        with self.lock:
+            fetching = self.fetching.setdefault(base, Lock())
+
+        with fetching:
+            table = self.peek(base)
+            if table is not None:
+                return table
+            return self._fetch(base)
+
+    def peek(self, base: str) -> Optional[Rates]:
+        """Returns the rate table of a base currency if it can be served
+        without waiting on a fetch, refreshing it in the background if it's
+        stale; None if it must be fetched first."""
+
+        entry = self.tables.get(base)
+        if entry is None:
+            return None
+
+        fetched, table = entry
+        age = self.clock() - fetched
+        if age < self.ttl:
+            return table
+        if self.max_age is None or age < self.max_age:
+            self.refresh(base)
+            return table
+
+        return None
+
+    def refresh(self, base: str):
+        """Refetches the rate table of a base currency in the background,
+        unless it's already being refreshed."""
+
+        with self.lock:
+            if base in self.refreshing:
+                return
+            self.refreshing.add(base)
+
+        Thread(target=self._refresh, args=(base,), daemon=True).start()
+
+    def invalidate(self, base: Optional[str] = None):
+        """Drops the cached table of a base currency, or of every currency."""
+
+        with self.lock:
+            if base is None:
+                self.tables.clear()
+            else:
+                self.tables.pop(base, None)
+
+    def _fetch(self, base: str) -> Rates:
+        """Fetches & caches the rate table of a base currency."""
+
+        table = self.fetch(base)
+        with self.lock:
+            self.tables[base] = (self.clock(), table)
+        return table
+
+    def _refresh(self, base: str):
+        """Background refresh; keeps serving the stale table if it fails."""
+
+        try:
+            self._fetch(base)
+        except Exception:
+            pass
+        finally:
+            with self.lock:
+                self.refreshing.discard(base)
+
+class AsyncRateCache():
+    """Asynchronous front of a `RateCache`, for use from an event loop.
+
+    Tables the cache can serve are returned at once. Otherwise the table is
+    fetched in a thread pool, and every coroutine missing the same base
+    currency meanwhile awaits that one fetch, so a burst of misses makes a
+    single request upstream without blocking the event loop.
+    """
+
+    def __init__(self, rates: RateCache, executor: Optional[Executor] = None):
+        """Wraps the cache *rates*, fetching in *executor* (by default, the
+        event loop's default executor)."""
+
+        self.rates = rates
+        self.executor = executor
+
+        # base => fetch in flight
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    async def get_rates(self, base: str) -> Rates:
+        """Returns the rate table of a base currency, fetching it if it isn't
+        cached (or is too old to be served)."""
+
+        table = self.rates.peek(base)
+        if table is not None:
+            return table
+
+        future = self.pending.get(base)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, self.rates.get_rates, base)
+            self.pending[base] = future
+            future.add_done_callback(lambda _: self.pending.pop(base, None))
+
+        # shielded, so one cancelled request doesn't cancel the others' fetch
+        return await asyncio.shield(future)
+
+class RateMatrix():
+    """Matrix of the exchange rates between every pair of currencies, derived
+    from the rate table of a single base currency.
+
+    Converting between any two currencies is a single lookup, and a batch of
+    conversions a single vectorized multiply. The matrix is rebuilt whenever
+    the underlying cache refreshes the base table.
+
+    >>> matrix = RateMatrix(RateCache(lambda base: {"USD": 2.0, "GBP": 0.5}))
+    >>> matrix.rate("USD", "GBP"), matrix.rate("GBP", "EUR")
+    (0.25, 2.0)
+    >>> matrix.convert_many(["EUR", "USD"], ["USD", "EUR"], [10, 10]).tolist()
+    [20.0, 5.0]
+    """
+
+    def __init__(self, rates: RateCache, base: str = "EUR"):
+        """Creates a matrix of the rates derived from the table of *base* in
+        the cache *rates*."""
+
+        self.rates = rates
+        self.base = base
+
+        # base table the matrix was built from; (code => index, matrix)
+        self.source: Optional[Rates] = None
+        self.built: Tuple[Dict[str, int], np.ndarray] = ({}, np.empty((0, 0)))
+        self.lock = Lock()
+
+    def table(self) -> Tuple[Dict[str, int], np.ndarray]:
+        """Returns the current index of currency codes & matrix of rates,
+        where ``matrix[index[a], index[b]]`` is the value of 1 *a* in *b*.
+
+        Raises
+        ------
+        `Exception`
+            Whatever the cache raises if the base table can't be fetched.
+        """
+
+        source = self.rates.get_rates(self.base)
+        if source is not self.source:
+            with self.lock:
+                if source is not self.source:
+                    self.built = self._build(source)
+                    self.source = source
+
+        return self.built
+
+    def _build(self, source: Rates) -> Tuple[Dict[str, int], np.ndarray]:
+        """Builds the index & matrix of rates from a base table."""
+
+        table = dict(source)
+        table.setdefault(self.base, 1.0)
+
+        codes = sorted(table)
+        values = np.array([table[code] for code in codes], dtype=np.float64)
+
+        index = {code: i for i, code in enumerate(codes)}
+        matrix = values[np.newaxis, :] / values[:, np.newaxis]
+        matrix.flags.writeable = False
+        return index, matrix
+
+    @property
+    def codes(self) -> List[str]:
+        """Every currency code in the matrix, sorted."""
+
+        return list(self.table()[0])
+
+    def __contains__(self, code: object) -> bool:
+        """Whether or not *code* is a currency in the matrix."""
+
+        return code in self.table()[0]
+
+    def rate(self, c_from: str, c_to: str) -> float:
+        """Returns the value of one unit of *c_from* in *c_to*.
+
+        Raises
+        ------
+        `KeyError`
+            If either currency code is unknown.
+        """
+
+        index, matrix = self.table()
+        return float(matrix[index[c_from], index[c_to]])
+
+    def convert_many(self,
+        c_from: Sequence[str],
+        c_to: Sequence[str],
+        amounts: Sequence[float]
+    ) -> np.ndarray:
+        """Converts each of *amounts* from the matching currency of *c_from*
+        to that of *c_to*, returning an array of the converted amounts.
+
+        Raises
+        ------
+        `KeyError`
+            If any currency code is unknown.
+        """
+
+        index, matrix = self.table()
+        rows = np.fromiter((index[c] for c in c_from), dtype=np.intp, count=len(c_from))
+        cols = np.fromiter((index[c] for c in c_to), dtype=np.intp, count=len(c_to))
+        return matrix[rows, cols] * np.asarray(amounts, dtype=np.float64)
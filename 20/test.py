@@ -1,9 +1,30 @@
+import os
+
+# convert using the rates in the test snapshot rather than over the network
+os.environ['FOREX_RATES'] = "snapshot:" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_snapshot.json")
+
+# keep the rate history of test runs apart from the real one
+from tempfile import TemporaryDirectory
+history_directory = TemporaryDirectory()
+os.environ['FOREX_HISTORY'] = os.path.join(history_directory.name, "rates.history")
+
 from unittest import TestCase
 from app import app, Decimal
 from werkzeug.datastructures import Headers
 from flask import Response
 from typing import *
 from errors import *
+from rates import AsyncRateCache, RateCache, RateMatrix
+from providers import RateProvider, RatesNotAvailableError, SnapshotProvider, read_snapshot, refresh_snapshot, write_snapshot
+from datetime import date
+from history import write_history
+from asgi import app as asgi_app
+from unittest.mock import patch
+import convert
+import asyncio
+import io
+import json
+from time import sleep
 
 class FlaskTests(TestCase):
     """A set of tests for the Currency Exchange server API."""
@@ -127,4 +148,271 @@ class FlaskTests(TestCase):
                     json=test[1]
                 )
                 self.common_test(test, response)
-    
\ No newline at end of file
+    
+class RateCacheTests(TestCase):
+    """A set of tests for the exchange rate cache."""
+
+    def test_stale_while_revalidate(self):
+        """Tests that fresh rates are served from memory, and that stale
+        rates are served while being refreshed in the background."""
+
+        now = [0.0]
+        fetches = []
+
+        def fetch(base: str) -> Mapping[str, float]:
+            fetches.append(base)
+            return {"USD": float(len(fetches))}
+
+        cache = RateCache(fetch, ttl=10, max_age=100, clock=lambda: now[0])
+        self.assertEqual(cache.get_rates("EUR"), {"USD": 1.0})
+
+        now[0] = 5
+        self.assertEqual(cache.get_rates("EUR"), {"USD": 1.0})
+        self.assertEqual(fetches, ["EUR"])
+
+        # stale: served as-is, refreshed in the background
+        now[0] = 20
+        self.assertEqual(cache.get_rates("EUR"), {"USD": 1.0})
+        while cache.refreshing:
+            sleep(0.01)
+        self.assertEqual(cache.get_rates("EUR"), {"USD": 2.0})
+
+        # too old to be served: refetched first
+        now[0] = 500
+        self.assertEqual(cache.get_rates("EUR"), {"USD": 3.0})
+
+class RateMatrixTests(TestCase):
+    """A set of tests for the cross-rate matrix."""
+
+    def test_cross_rates(self):
+        """Tests that every pair of currencies converts through the base
+        table, and that the matrix follows refreshes of the base table."""
+
+        table = {"USD": 2.0, "JPY": 200.0}
+        cache = RateCache(lambda base: dict(table), ttl=10, max_age=None)
+        matrix = RateMatrix(cache, "EUR")
+
+        self.assertEqual(matrix.codes, ["EUR", "JPY", "USD"])
+        self.assertEqual(matrix.rate("USD", "JPY"), 100.0)
+        self.assertEqual(matrix.rate("JPY", "JPY"), 1.0)
+        self.assertEqual(
+            matrix.convert_many(["USD", "JPY", "EUR"], ["EUR", "USD", "JPY"], [1, 100, 3]).tolist(),
+            [0.5, 1.0, 600.0]
+        )
+        with self.assertRaises(KeyError):
+            matrix.rate("USD", "XXA")
+
+        table["USD"] = 4.0
+        cache.invalidate()
+        self.assertEqual(matrix.rate("USD", "JPY"), 50.0)
+
+class BatchTests(TestCase):
+    """A set of tests for the batch conversion entrypoint."""
+
+    def test_json(self):
+        """Tests that every conversion in a JSON array is answered in order,
+        with errors reported per conversion."""
+
+        with app.test_client() as client:
+            response = client.post('/batch', json=[
+                {'from': 'EUR', 'to': 'USD', 'amount': '10.10'},
+                {'from': 'gbp', 'to': 'eur', 'amount': 3},
+                {'from': 'XXD', 'to': 'USD', 'amount': 1},
+                {'from': 5, 'to': 'USD', 'amount': 1}
+            ])
+            self.assertEqual(response.status_code, 200)
+
+            results = json.loads(response.get_data(as_text=True), parse_float=str)["results"]
+            self.assertEqual(results[0], {'type': 'success', 'value': '12.6250'})
+            self.assertEqual(results[1], {'type': 'success', 'value': 6})
+            self.assertEqual(results[2]["errors"], [invalid_currency_code_error('XXD')])
+            self.assertEqual(results[3]["errors"], [invalid_currency_code_error(5)])
+
+            response = client.post('/batch', json={'from': 'EUR'})
+            self.assertEqual(response.status_code, 400)
+
+    def test_csv(self):
+        """Tests that conversions can be uploaded as a CSV file."""
+
+        with app.test_client() as client:
+            response = client.post('/batch', data={
+                'file': (io.BytesIO(b"from,to,amount\nUSD,GBP,2.50\nEUR,USD,\n"), "batch.csv")
+            })
+            self.assertEqual(response.status_code, 200)
+
+            # amounts keep their precision, and are converted at the quoted rates
+            results = json.loads(response.get_data(as_text=True), parse_float=str)["results"]
+            self.assertEqual(results[0], {'type': 'success', 'value': '1.000'})
+            self.assertEqual(results[1]["errors"], [not_a_number_error('amount')])
+
+            response = client.post('/batch', data={
+                'file': (io.BytesIO(b"from,to,amount\nUSD,GBP,\xff\n"), "batch.csv")
+            })
+            self.assertEqual(response.status_code, 400)
+
+class SnapshotProviderTests(TestCase):
+    """A set of tests for rates read from snapshot files."""
+
+    def test_dated_rates(self):
+        """Tests that the latest table on or before a date is served, and
+        that other bases are derived from it."""
+
+        provider = SnapshotProvider(os.environ['FOREX_RATES'][len("snapshot:"):])
+
+        self.assertEqual(provider.get_rates("EUR")["USD"], 1.25)
+        self.assertEqual(provider.get_rates("EUR", date(2020, 9, 30))["USD"], 1.2)
+        self.assertEqual(provider.get_rates("USD", date(2020, 10, 5))["EUR"], 0.8)
+        with self.assertRaises(RatesNotAvailableError):
+            provider.get_rates("EUR", date(2020, 8, 31))
+        with self.assertRaises(RatesNotAvailableError):
+            provider.get_rates("XXD")
+
+    def test_refresh(self):
+        """Tests that refreshing a snapshot adds fetched tables to it, in
+        either file format."""
+
+        class FixedProvider(RateProvider):
+            def get_rates(self, base: str, date_obj: Optional[date] = None) -> Mapping[str, float]:
+                if date_obj == date(2020, 10, 2):
+                    raise RatesNotAvailableError(base)
+                return {"USD": 1.5 if date_obj is None else 1.0}
+
+        with TemporaryDirectory() as directory:
+            for name in ("rates.json", "rates.csv"):
+                filename = os.path.join(directory, name)
+                write_snapshot(filename, [(date(2020, 1, 1), "GBP", {"USD": 1.3})])
+
+                fetched = refresh_snapshot(filename, FixedProvider(), "EUR", 3, date(2020, 10, 3))
+                self.assertEqual(fetched, 2)
+                self.assertEqual(sorted(read_snapshot(filename)), [
+                    (date(2020, 1, 1), "GBP", {"USD": 1.3}),
+                    (date(2020, 10, 1), "EUR", {"USD": 1.0}),
+                    (date(2020, 10, 3), "EUR", {"USD": 1.5})
+                ])
+
+class HistoryTests(TestCase):
+    """A set of tests for conversions at past dates."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Builds the rate history from the test snapshot."""
+
+        write_history(os.environ['FOREX_HISTORY'], read_snapshot(os.environ['FOREX_RATES'][len("snapshot:"):]))
+
+    def test_convert_at_date(self):
+        """Tests that conversions at a date use the latest rates on or
+        before it."""
+
+        with app.test_client() as client:
+            response = client.post('/batch', json=[
+                {'from': 'USD', 'to': 'GBP', 'amount': 3, 'date': '2020-09-30'},
+                {'from': 'USD', 'to': 'GBP', 'amount': 3, 'date': '2020-10-02'},
+                {'from': 'USD', 'to': 'GBP', 'amount': 3, 'date': '2020-08-31'},
+                {'from': 'USD', 'to': 'GBP', 'amount': 3, 'date': '31/08/2020'}
+            ])
+
+            results = response.json["results"]
+            self.assertAlmostEqual(results[0]["value"], 2)
+            self.assertAlmostEqual(results[1]["value"], 1.2)
+            self.assertEqual(results[2]["errors"], [no_rates_error('USD', 'GBP', '2020-08-31')])
+            self.assertEqual(results[3]["errors"], [invalid_date_error('date')])
+
+    def test_range(self):
+        """Tests the date range entrypoint for reporting."""
+
+        with app.test_client() as client:
+            response = client.get('/history?from=usd&to=EUR,JPY&start=2020-09-01&end=2020-12-31')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json["dates"], ["2020-09-01", "2020-10-01"])
+            self.assertEqual(response.json["rates"]["JPY"], [100.0, 100.0])
+            self.assertEqual(response.json["rates"]["EUR"], [1 / 1.2, 0.8])
+
+            response = client.get('/history?from=USD&to=XXD&start=2020-09-01')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json["errors"], [
+                missing_argument_error('end'),
+                invalid_currency_code_error('XXD')
+            ])
+
+    def test_no_history(self):
+        """Tests that the date range entrypoint reports a missing rate
+        history as such, rather than as unknown currencies."""
+
+        with patch.object(convert, "HISTORY_FILE", os.path.join(history_directory.name, "missing.history")):
+            with app.test_client() as client:
+                response = client.get('/history?from=USD&to=EUR&start=2020-09-01&end=2020-12-31')
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json["errors"], [no_history_error()])
+
+class CurrencyTests(TestCase):
+    """A set of tests for the currency table entrypoint."""
+
+    def test_currencies(self):
+        """Tests that the currency table is served with caching headers,
+        and revalidated without resending it."""
+
+        with app.test_client() as client:
+            response = client.get('/currencies')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(
+                {'code': 'GBP', 'symbol': '£', 'name': 'British pound'},
+                response.json["currencies"]
+            )
+            self.assertIn('max-age', response.headers['Cache-Control'])
+
+            response = client.get('/currencies', headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+
+class AsyncTests(TestCase):
+    """A set of tests for the asynchronous server variant."""
+
+    def test_coalesce(self):
+        """Tests that concurrent misses for the same base currency wait on
+        a single fetch."""
+
+        fetches = []
+
+        def fetch(base: str) -> Mapping[str, float]:
+            fetches.append(base)
+            sleep(0.1)
+            return {"USD": 1.25}
+
+        cache = AsyncRateCache(RateCache(fetch))
+
+        async def burst():
+            return await asyncio.gather(*(cache.get_rates(base) for base in ["EUR"] * 10 + ["GBP"] * 5))
+
+        tables = asyncio.run(burst())
+        self.assertEqual(tables, [{"USD": 1.25}] * 15)
+        self.assertEqual(sorted(fetches), ["EUR", "GBP"])
+
+    def test_asgi(self):
+        """Tests that the existing routes are served over ASGI."""
+
+        async def request(method: str, path: str, query: bytes = b"", body: bytes = b"") -> Tuple[int, bytes]:
+            messages = [{"type": "http.request", "body": body}]
+            sent = []
+
+            async def receive():
+                return messages.pop(0)
+
+            async def send(message):
+                sent.append(message)
+
+            await asgi_app({
+                "type": "http",
+                "method": method,
+                "path": path,
+                "query_string": query,
+                "headers": [(b"accept", b"application/json"), (b"content-type", b"application/json")]
+            }, receive, send)
+            return sent[0]["status"], sent[1]["body"]
+
+        status, body = asyncio.run(request("GET", "/", b"from=USD&to=GBP&amount=10"))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["value"], 4)
+
+        status, body = asyncio.run(request("POST", "/batch", body=b'[{"from": "EUR", "to": "JPY", "amount": 2}]'))
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["results"][0]["value"], 250)
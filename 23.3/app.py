@@ -3,16 +3,20 @@
 # == INCLUDES ==================================================================================== #
 
 import sys
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from datetime import datetime
+import json
 
 # Flask stuff
-from flask import flash, Flask, jsonify, make_response, redirect, render_template, request
+from flask import flash, Flask, jsonify, make_response, redirect, render_template, request, url_for
 from flask_accept import accept
 from flask_debugtoolbar import DebugToolbarExtension
 from flaskkey import get_key
 
 # Database stuff
 from models import *
+from sqlalchemy import tuple_
+from sqlalchemy.orm import joinedload, lazyload, selectinload
 from dbcred import get_database_uri
 
 # Error strings
@@ -73,13 +77,117 @@ def check_for_and_strip_strparam(
         
     return rv
 
+# Number of rows in a page of a JSON listing by default, and at most
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encodes the sort key of the last row of a page as an opaque cursor."""
+
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, types: Sequence[Callable[[Any], Any]]) -> Optional[List[Any]]:
+    """Decodes a cursor made by `encode_cursor`, converting each value of the
+    sort key with the matching function of *types*; None if it's malformed."""
+
+    try:
+        values = json.loads(urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            return None
+        return [convert(value) for convert, value in zip(types, values)]
+    except (ValueError, TypeError):
+        return None
+
+def paginate(
+    query,
+    columns: Sequence[Any],
+    types: Sequence[Callable[[Any], Any]],
+    mapping: Mapping[str, str],
+    errors: List[str]
+) -> Tuple[List[Any], Optional[str]]:
+    """Retrieves a page of a query's rows by keyset pagination.
+
+    Rows are sorted by *columns*, which must uniquely identify a row, and the
+    page starts after the row whose sort key is encoded in the "after"
+    parameter, so every page is found with an index seek however deep it is.
+
+    Parameters
+    ----------
+    query: `flask_sqlalchemy.BaseQuery`
+        Query of the rows to page through.
+
+    columns: `Sequence[Any]`
+        Columns to sort by, ending in the primary key.
+
+    types: `Sequence[Callable[[Any], Any]]`
+        Converts each value of a decoded cursor to the type of its column.
+
+    mapping: `Mapping[str, str]`
+        Set of parameters, holding the optional "limit" & "after".
+
+    errors: `List[str]`
+        List of errors to append to.
+
+    Returns
+    -------
+    `Tuple[List[Any], Optional[str]]`
+        The page's rows, and the cursor of the next page if there is one.
+    """
+
+    limit = mapping.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(limit)
+    except ValueError:
+        errors.append(invalid_parameter("limit"))
+
+    after = mapping.get("after")
+    if after is not None:
+        after = decode_cursor(after, types)
+        if after is None:
+            errors.append(invalid_parameter("after"))
+
+    if len(errors) > 0:
+        return [], None
+
+    if after is not None:
+        query = query.filter(tuple_(*columns) > tuple_(*after))
+    rows = query.order_by(*columns).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], column.key) for column in columns])
+
+def page_response(body: Any, cursor: Optional[str]):
+    """Makes a JSON response for a page of a listing, linking to the next
+    page in its Link header if there is one."""
+
+    response = jsonify(body)
+    if cursor is not None:
+        url = url_for(
+            request.endpoint,
+            **request.view_args,
+            limit=request.args.get("limit", DEFAULT_PAGE_SIZE),
+            after=cursor,
+            _external=True
+        )
+        response.headers["Link"] = f'<{url}>; rel="next"'
+    return response
+
 # == PAGE ROUTES ===================================================================================
 
 @app.route("/")
 def homepage():
     """Renders a homepage with the last five posts if available."""
 
-    posts = Post.query.order_by(Post.created_at.desc()).limit(5).all()
+    posts = Post.query.options(
+        joinedload(Post.user),
+        selectinload(Post.tags)
+    ).order_by(Post.created_at.desc()).limit(5).all()
     return render_template("homepage.html", posts=posts)
 
 # ---- USER-RELATED STUFF ------------------------------------------------------------------------ #
@@ -94,9 +202,24 @@ def user_listing():
 
 @user_listing.support('application/json')
 def get_users():
-    """Retrieves a list of users in the form of a JSON array."""
+    """Retrieves a page of users, sorted by name, in the form of a JSON array.
+    The next page, if any, is linked in the Link header."""
 
-    return jsonify([user.to_dict() for user in User.get_sorted()])
+    errors = []
+    users, cursor = paginate(
+        User.query,
+        (User.last_name, User.first_name, User.id),
+        (str, str, int),
+        request.args,
+        errors
+    )
+
+    if len(errors) > 0:
+        return make_response(jsonify({
+            'type': 'error',
+            'errors': errors
+        }), 400)
+    return page_response([user.to_dict() for user in users], cursor)
 
 # ------ CREATE NEW USER ------------------------------------------------------------------------- #
 
@@ -187,7 +310,10 @@ def get_user(user_id: str):
 def user_page(user_id: str):
     """Renders a user's page."""
 
-    user = User.query.get_or_404(user_id)
+    # posts' author is the user itself, already in the session
+    user = User.query.options(
+        selectinload(User.posts).lazyload(Post.user)
+    ).get_or_404(user_id)
     return render_template("user.html", user=user)
 
 # ------ EDIT USER ------------------------------------------------------------------------------- #
@@ -303,7 +429,8 @@ def delete_user_form(user_id: str):
 @app.route("/users/<user_id>/posts", methods=["GET"])
 @accept("application/json")
 def get_posts(user_id: str):
-    """Returns a JSON array of posts from a given user."""
+    """Returns a JSON array of a page of posts from a given user, oldest first.
+    The next page, if any, is linked in the Link header."""
 
     user = User.query.get(user_id)
     if user is None:
@@ -311,10 +438,25 @@ def get_posts(user_id: str):
             'type': 'error',
             'errors': ['Invalid user ID']
         }), 404)
-    return jsonify({
+
+    errors = []
+    posts, cursor = paginate(
+        Post.query.filter(Post.user_id == user.id).options(lazyload(Post.user)),
+        (Post.created_at, Post.id),
+        (datetime.fromisoformat, int),
+        request.args,
+        errors
+    )
+
+    if len(errors) > 0:
+        return make_response(jsonify({
+            'type': 'error',
+            'errors': errors
+        }), 400)
+    return page_response({
         'type': 'success',
-        'posts': [ post.to_dict() for post in user.posts ]
-    })
+        'posts': [ post.to_dict() for post in posts ]
+    }, cursor)
     
 # ------ CREATE POST ----------------------------------------------------------------------------- #
 
@@ -568,9 +710,24 @@ def tag_listing():
 
 @tag_listing.support('application/json')
 def get_tags():
-    """Retrieves a list of tags in the form of a JSON array."""
+    """Retrieves a page of tags, in order of creation, in the form of a JSON
+    array. The next page, if any, is linked in the Link header."""
+
+    errors = []
+    tags, cursor = paginate(
+        Tag.query,
+        (Tag.id,),
+        (int,),
+        request.args,
+        errors
+    )
 
-    return jsonify([tag.to_dict() for tag in Tag.query.all()])
+    if len(errors) > 0:
+        return make_response(jsonify({
+            'type': 'error',
+            'errors': errors
+        }), 400)
+    return page_response([tag.to_dict() for tag in tags], cursor)
 
 # ------ CREATE NEW TAG -------------------------------------------------------------------------- #
 
@@ -650,7 +807,9 @@ def get_tag(tag_id: str):
 def tag_page(tag_id: str):
     """Renders a tag page."""
 
-    tag = Tag.query.get_or_404(tag_id)
+    tag = Tag.query.options(
+        selectinload(Tag.posts).lazyload(Post.user)
+    ).get_or_404(tag_id)
     return render_template("tag.html", tag=tag)
 
 # ------ EDITING TAG ----------------------------------------------------------------------------- #
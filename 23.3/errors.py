@@ -8,3 +8,7 @@ def requires_nonwhitespace_chars(param: str) -> str:
 
     return f'"{param}" must have at least one nonwhitespace character'
 
+def invalid_parameter(param: str) -> str:
+    """Returns error string for a parameter with an invalid value."""
+
+    return f'Invalid value for parameter "{param}"'
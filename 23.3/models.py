@@ -26,6 +26,11 @@ class User(db.Model, SerializerMixin):
 
     __tablename__ = "users"
 
+    # users are listed & paginated in (last_name, first_name, id) order
+    __table_args__ = (
+        db.Index('ix_users_name', 'last_name', 'first_name', 'id'),
+    )
+
     id = db.Column(
         db.Integer,
         primary_key = True,
@@ -48,7 +53,13 @@ class User(db.Model, SerializerMixin):
         nullable = False
     )
 
-    posts = db.relationship('Post', cascade="all,delete")
+    # a user's posts are only loaded when accessed; pages listing them load
+    # them explicitly, in one extra SELECT
+    posts = db.relationship('Post',
+        cascade="all,delete",
+        back_populates="user",
+        lazy="select"
+    )
 
     @property
     def full_name(self):
@@ -72,6 +83,13 @@ class Post(db.Model, SerializerMixin):
 
     __tablename__ = "posts"
 
+    # posts are listed & paginated in (created_at, id) order, overall and
+    # per user
+    __table_args__ = (
+        db.Index('ix_posts_created', 'created_at', 'id'),
+        db.Index('ix_posts_user_created', 'user_id', 'created_at', 'id'),
+    )
+
     id = db.Column(
         db.Integer,
         primary_key = True,
@@ -104,7 +122,12 @@ class Post(db.Model, SerializerMixin):
         nullable = False
     )
     
-    user = db.relationship('User')
+    # every post has an author, so it's joined into the post's own SELECT
+    user = db.relationship('User',
+        back_populates="posts",
+        lazy="joined",
+        innerjoin=True
+    )
 
     @property
     def created_timestamp(self):
@@ -134,7 +157,9 @@ class Tag(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key = True)
     name = db.Column(db.Text, nullable = False, unique = True)
 
+    # loaded when accessed, like User.posts
     posts = db.relationship('Post',
         secondary="post_tags",
-        backref="tags"
+        backref=db.backref("tags", lazy="select"),
+        lazy="select"
     )
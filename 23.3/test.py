@@ -5,9 +5,13 @@ from models import *
 from errors import *
 
 from dbcred import get_database_uri
+from datetime import datetime
+from sqlalchemy import event
 
 import re
 
+from typing import *
+
 app.config['SQLALCHEMY_DATABASE_URI'] = get_database_uri("blogly_test", save=False)
 app.config['SQLALCHEMY_ECHO'] = False
 
@@ -493,3 +497,185 @@ class FlaskTests(TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(response.json['type'], 'success')
             self.assertIsNone(Post.query.get(post_id))
+
+class QueryCountTests(TestCase):
+    """Tests that pages load their posts, users & tags in a fixed number of
+    queries, however many rows they show."""
+
+    def setUp(self):
+        """Creates users with several tagged posts each."""
+
+        db.drop_all()
+        db.create_all()
+
+        tags = [Tag(name=name) for name in ("red", "green", "blue")]
+        db.session.add_all(tags)
+
+        for first_name, last_name in (("John", "Sir"), ("Steve", "Ross"), ("Ethan", "Byrd")):
+            user = User(first_name=first_name, last_name=last_name)
+            for i in range(4):
+                user.posts.append(Post(
+                    title = f"Post {i}",
+                    content = "Test content",
+                    created_at = datetime.utcnow(),
+                    updated_at = datetime.utcnow(),
+                    tags = tags[i % 2:]
+                ))
+            db.session.add(user)
+
+        db.session.commit()
+        db.session.remove()
+
+    def tearDown(self):
+        """Clean up any erroneous database transactions."""
+
+        db.drop_all()
+        db.create_all()
+
+    def count_queries(self, url: str) -> int:
+        """Renders a page & returns the number of SQL statements it ran."""
+
+        count = 0
+
+        def on_execute(*args):
+            nonlocal count
+            count += 1
+
+        event.listen(db.engine, "before_cursor_execute", on_execute)
+        try:
+            with app.test_client() as client:
+                response = client.get(url, headers = { "accept": "text/html" })
+                self.assertEqual(response.status_code, 200)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", on_execute)
+            db.session.remove()
+
+        return count
+
+    def test_homepage(self):
+        """Tests that the homepage loads posts with their users & tags in
+        two queries."""
+
+        self.assertEqual(self.count_queries("/"), 2)
+
+    def test_user_page(self):
+        """Tests that a user's page loads the user & their posts in two
+        queries."""
+
+        user = User.query.first()
+        self.assertEqual(self.count_queries(f"/users/{user.id}"), 2)
+
+    def test_tag_page(self):
+        """Tests that a tag's page loads the tag & its posts in two
+        queries."""
+
+        tag = Tag.query.filter_by(name="green").first()
+        self.assertEqual(self.count_queries(f"/tags/{tag.id}"), 2)
+
+    def test_edit_pages(self):
+        """Tests that editing a user or tag loads only that row."""
+
+        user = User.query.first()
+        tag = Tag.query.filter_by(name="green").first()
+        self.assertEqual(self.count_queries(f"/users/{user.id}/edit"), 1)
+        self.assertEqual(self.count_queries(f"/tags/{tag.id}/edit"), 1)
+
+    def test_listings(self):
+        """Tests that listing users or tags doesn't load their posts."""
+
+        self.assertEqual(self.count_queries("/users"), 1)
+        self.assertEqual(self.count_queries("/tags"), 1)
+
+class PaginationTests(TestCase):
+    """Tests for keyset pagination of the JSON listings."""
+
+    def setUp(self):
+        """Creates users with the same names & posts made at the same time,
+        so pages have to break ties."""
+
+        db.drop_all()
+        db.create_all()
+
+        now = datetime.utcnow()
+        for first_name, last_name in (
+            ("John", "Sir"), ("Steve", "Ross"), ("Ethan", "Byrd"), ("Amy", "Ross"),
+            ("John", "Sir"), ("Zed", "Byrd"), ("Steve", "Ross")
+        ):
+            db.session.add(User(first_name=first_name, last_name=last_name))
+        db.session.add_all(Tag(name=f"tag {i}") for i in range(5))
+        db.session.commit()
+
+        self.user = User.query.first()
+        for i in range(5):
+            db.session.add(Post(
+                title = f"Post {i}",
+                content = "Test content",
+                created_at = now if i < 3 else datetime(2020, 1, i),
+                updated_at = now,
+                user_id = self.user.id
+            ))
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up any erroneous database transactions."""
+
+        db.drop_all()
+        db.create_all()
+
+    def walk(self, url: str, key: Optional[str] = None) -> List[List[Any]]:
+        """Retrieves every page of a listing by following the Link header
+        of each page, returning the rows of each."""
+
+        link = re.compile(r'<(.*?)>; rel="next"')
+        pages = []
+
+        with app.test_client() as client:
+            while url is not None:
+                response = client.get(url, headers = { "accept": "application/json" })
+                self.assertEqual(response.status_code, 200)
+                pages.append(response.json if key is None else response.json[key])
+
+                match = link.match(response.headers.get("Link", ""))
+                url = match.group(1) if match else None
+
+        return pages
+
+    def test_users(self):
+        """Tests that pages of users are sorted by name & hold every user
+        exactly once."""
+
+        pages = self.walk("/users?limit=3")
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+
+        users = [user for page in pages for user in page]
+        self.assertEqual(
+            [user['id'] for user in users],
+            [user.id for user in User.query.order_by(User.last_name, User.first_name, User.id)]
+        )
+
+    def test_posts(self):
+        """Tests that pages of a user's posts are sorted oldest first."""
+
+        pages = self.walk(f"/users/{self.user.id}/posts?limit=2", "posts")
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [post['title'] for page in pages for post in page],
+            ["Post 3", "Post 4", "Post 0", "Post 1", "Post 2"]
+        )
+
+    def test_tags(self):
+        """Tests that tags are paged through, and that bad page parameters
+        are errors."""
+
+        pages = self.walk("/tags?limit=2")
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+        with app.test_client() as client:
+            response = client.get("/tags?limit=0&after=abc",
+                headers = { "accept": "application/json" }
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json['errors'], [
+                invalid_parameter('limit'),
+                invalid_parameter('after')
+            ])